@@ -1,6 +1,7 @@
 from django.contrib import admin
 from .models import (
-    Resource, Action, Permission, Role, RolePermission, UserRole
+    Resource, Action, Permission, Role, RoleParent, RolePermission,
+    UserRole
 )
 
 
@@ -34,13 +35,20 @@ class RolePermissionInline(admin.TabularInline):
     extra = 1
 
 
+class RoleParentInline(admin.TabularInline):
+    """Inline admin for parent roles."""
+    model = RoleParent
+    fk_name = 'role'
+    extra = 1
+
+
 @admin.register(Role)
 class RoleAdmin(admin.ModelAdmin):
     """Admin interface for Role."""
     list_display = ('name', 'description', 'created_at', 'updated_at')
     search_fields = ('name', 'description')
     list_filter = ('created_at', 'updated_at')
-    inlines = [RolePermissionInline]
+    inlines = [RoleParentInline, RolePermissionInline]
     filter_horizontal = ('permissions',)
 
 
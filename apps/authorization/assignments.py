@@ -0,0 +1,138 @@
+"""
+Пакетные изменения назначений прав.
+
+Изменения применяются по разнице множеств: добавляются только новые
+связи одним bulk_create, удаляются только лишние одним DELETE ... IN.
+Построчные сигналы на это время отключены, поэтому версия RBAC
+увеличивается один раз, а действующие права и кэш прав сбрасываются
+только для затронутых пользователей.
+"""
+from django.db import transaction
+
+from . import effective
+from .models import RolePermission, UserRole
+from .signals import batch_update
+from .version import bump_version
+
+
+def sync_role_permissions(role, permission_ids):
+    """
+    Привести разрешающие связи роли к набору `permission_ids`.
+
+    Запреты роли не затрагиваются; права, которые роль запрещает, не
+    добавляются как разрешения. Возвращает пару множеств
+    (добавленные id прав, удаленные id прав).
+    """
+    desired = set(permission_ids)
+    with transaction.atomic():
+        current = dict(
+            RolePermission.objects.filter(role=role).values_list(
+                'permission_id', 'effect'
+            )
+        )
+        allowed = {
+            permission_id
+            for permission_id, effect in current.items()
+            if effect == RolePermission.ALLOW
+        }
+        added = desired - set(current)
+        removed = allowed - desired
+        if not added and not removed:
+            return added, removed
+
+        with batch_update():
+            if removed:
+                RolePermission.objects.filter(
+                    role=role,
+                    permission_id__in=removed
+                ).delete()
+            if added:
+                RolePermission.objects.bulk_create(
+                    [
+                        RolePermission(role=role, permission_id=permission_id)
+                        for permission_id in added
+                    ],
+                    ignore_conflicts=True
+                )
+        # Кэш сбрасывается только у пользователей, чьи права изменились
+        changed = effective.refresh_users(
+            effective.users_of_roles([role.pk])
+        )
+        bump_version(changed)
+    return added, removed
+
+
+# Число пользователей в одном запросе при массовом назначении ролей
+BULK_BATCH_SIZE = 1000
+
+
+def _batches(items):
+    items = sorted(items)
+    for start in range(0, len(items), BULK_BATCH_SIZE):
+        yield items[start:start + BULK_BATCH_SIZE]
+
+
+def _refresh(user_ids):
+    # Состав ролей пользователей изменился, поэтому сбрасываются все
+    # затронутые, даже если их права остались прежними
+    bump_version(user_ids)
+    for batch in _batches(user_ids):
+        effective.refresh_users(batch)
+
+
+def assign_roles(user_ids, role_ids):
+    """
+    Назначить роли `role_ids` пользователям `user_ids`.
+
+    Уже существующие назначения пропускаются. Возвращает пару
+    (создано назначений, пропущено назначений).
+    """
+    user_ids, role_ids = set(user_ids), set(role_ids)
+    created = skipped = 0
+    affected = set()
+    with transaction.atomic(), batch_update():
+        for batch in _batches(user_ids):
+            existing = set(
+                UserRole.objects.filter(
+                    user_id__in=batch,
+                    role_id__in=role_ids
+                ).values_list('user_id', 'role_id')
+            )
+            new = [
+                UserRole(user_id=user_id, role_id=role_id)
+                for user_id in batch
+                for role_id in role_ids
+                if (user_id, role_id) not in existing
+            ]
+            UserRole.objects.bulk_create(new, ignore_conflicts=True)
+            created += len(new)
+            skipped += len(existing)
+            affected.update(user_role.user_id for user_role in new)
+        if affected:
+            _refresh(affected)
+    return created, skipped
+
+
+def revoke_roles(user_ids, role_ids):
+    """
+    Отозвать роли `role_ids` у пользователей `user_ids`.
+
+    Возвращает пару (отозвано назначений, пропущено пар без назначения).
+    """
+    user_ids, role_ids = set(user_ids), set(role_ids)
+    revoked = 0
+    affected = set()
+    with transaction.atomic(), batch_update():
+        for batch in _batches(user_ids):
+            assignments = UserRole.objects.filter(
+                user_id__in=batch,
+                role_id__in=role_ids
+            )
+            affected.update(
+                assignments.values_list('user_id', flat=True).distinct()
+            )
+            revoked += assignments.delete()[0]
+        if affected:
+            _refresh(affected)
+    skipped = len(user_ids) * len(role_ids) - revoked
+    return revoked, skipped
@@ -0,0 +1,46 @@
+"""
+Кэш решений о правах доступа.
+
+Использует тот же двухуровневый кэш, что и аутентификация, поэтому
+изменения RBAC, сделанные на одном узле, видны на всех остальных.
+
+Пакетные изменения назначений инвалидируют не все пространство, а
+только записи затронутых пользователей: их маски удаляются, а метка
+`<id>:stamp` запоминает версию RBAC, начиная с которой маски
+пользователя действительны. Метка защищает от записи масок,
+вычисленных конкурентно по старой политике.
+
+Обычно метки у пользователя нет, поэтому L1 запоминает и отсутствие
+ключа: проверка с масками в L1 не обращается к L2.
+"""
+from django.conf import settings
+
+from config.cache import TwoTierCache
+
+
+permission_cache = TwoTierCache(
+    'perm',
+    version=5,
+    ttl=getattr(settings, 'PERMISSION_CACHE_TTL', 300),
+    local_ttl=getattr(settings, 'PERMISSION_CACHE_LOCAL_TTL', 5),
+    local_max_size=getattr(settings, 'PERMISSION_CACHE_MAX_SIZE', 10000),
+    enabled=getattr(settings, 'PERMISSION_CACHE_ENABLED', True),
+    cache_missing=True,
+)
+
+
+def masks_key(user_id):
+    return f'{user_id}:masks'
+
+
+def stamp_key(user_id):
+    return f'{user_id}:stamp'
+
+
+def invalidate_users(user_ids, version):
+    """Сделать недействительными маски пользователей `user_ids`."""
+    user_ids = list(user_ids)
+    permission_cache.set_many({
+        stamp_key(user_id): version for user_id in user_ids
+    })
+    permission_cache.delete_many([masks_key(user_id) for user_id in user_ids])
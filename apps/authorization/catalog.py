@@ -0,0 +1,114 @@
+"""
+Каталог имен ресурсов, действий и прав.
+
+Сопоставление имен с id меняется редко, поэтому оно загружается целиком
+и хранится в кэше прав вместе с версией RBAC, по которой построено.
+Проверки и назначения по именам получают id из каталога без обращения
+к БД и дальше работают с role_permissions напрямую по permission_id,
+без соединений с resources и actions. При изменении версии RBAC каталог
+перечитывается при следующем обращении.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+
+from .cache import permission_cache
+from .models import WILDCARD, Action, Permission, Resource
+from .version import current_version
+
+
+# version — версия RBAC, по которой построен каталог;
+# resources, actions — имя -> id;
+# permissions — (имя ресурса, имя действия) -> id права.
+Catalog = namedtuple('Catalog', (
+    'version',
+    'resources',
+    'actions',
+    'permissions',
+))
+
+
+class PermissionCatalog:
+    """Сопоставление имен ресурсов, действий и прав с их id."""
+
+    CACHE_KEY = 'catalog'
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    @staticmethod
+    def load(version):
+        """Прочитать каталог из БД (три запроса)."""
+        return Catalog(
+            version=version,
+            resources=dict(Resource.objects.values_list('name', 'id')),
+            actions=dict(Action.objects.values_list('name', 'id')),
+            permissions={
+                (resource_name, action_name): permission_id
+                for permission_id, resource_name, action_name
+                in Permission.objects.values_list(
+                    'id', 'resource__name', 'action__name'
+                )
+            },
+        )
+
+    def current(self):
+        """Каталог текущей версии RBAC."""
+        version = current_version()
+        catalog = self.cache.get(self.CACHE_KEY)
+        if catalog is None or catalog.version != version:
+            catalog = self.load(version)
+            self.cache.set(self.CACHE_KEY, catalog)
+        return catalog
+
+    def permission_id(self, resource_name, action_name):
+        """id права по именам или None, если такого права нет."""
+        return self.current().permissions.get((resource_name, action_name))
+
+    def matching_permission_ids(self, resource_name, action_name):
+        """
+        id прав, подходящих под пару: точного права и шаблонов с '*'
+        вместо ресурса и (или) действия.
+        """
+        permissions = self.current().permissions
+        ids = set()
+        for resource in (resource_name, WILDCARD):
+            for action in (action_name, WILDCARD):
+                permission_id = permissions.get((resource, action))
+                if permission_id is not None:
+                    ids.add(permission_id)
+        return ids
+
+    def get_or_create_permission_id(self, resource_name, action_name):
+        """
+        id права по именам, при необходимости с созданием ресурса,
+        действия и права.
+
+        Возвращает пару (id права, создано ли право). Если право есть в
+        каталоге, обращения к БД нет; иначе создаются только
+        недостающие записи.
+        """
+        catalog = self.current()
+        permission_id = catalog.permissions.get((resource_name, action_name))
+        if permission_id is not None:
+            return permission_id, False
+
+        with transaction.atomic():
+            resource_id = catalog.resources.get(resource_name)
+            if resource_id is None:
+                resource_id = Resource.objects.get_or_create(
+                    name=resource_name
+                )[0].pk
+            action_id = catalog.actions.get(action_name)
+            if action_id is None:
+                action_id = Action.objects.get_or_create(
+                    name=action_name
+                )[0].pk
+            permission, created = Permission.objects.get_or_create(
+                resource_id=resource_id,
+                action_id=action_id
+            )
+        return permission.pk, created
+
+
+permission_catalog = PermissionCatalog(permission_cache)
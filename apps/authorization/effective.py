@@ -0,0 +1,167 @@
+"""
+Материализованная таблица действующих прав пользователей.
+
+Таблица user_effective_permissions хранит строки (user_id, resource_name,
+action_name, effect), выведенные из ролей пользователя, с покрывающим
+уникальным индексом. Если хотя бы одна роль запрещает право, строка
+записывается с запретом: запрет всегда сильнее разрешения. Проверка
+права при включенной таблице — один поиск по индексу без соединений.
+Таблица поддерживается инкрементально сигналами: при изменении
+назначений пересчитываются только затронутые пользователи.
+"""
+from django.db import transaction
+
+from .models import RolePermission, UserEffectivePermission, UserRole
+
+
+# Размер пакета при полной перестройке
+REBUILD_BATCH_SIZE = 5000
+
+
+def granted_permissions(user_ids=None):
+    """
+    Множество строк (user_id, resource, action, effect), выданных ролями,
+    в том числе унаследованными.
+
+    При `user_ids=None` — для всех пользователей.
+    """
+    # Права ролей-предков берутся из развернутого замыкания иерархии
+    path = 'role__ancestor_links__ancestor__role_permissions'
+    queryset = UserRole.objects.filter(**{f'{path}__isnull': False})
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    rows = set(
+        queryset.values_list(
+            'user_id',
+            f'{path}__permission__resource__name',
+            f'{path}__permission__action__name',
+            f'{path}__effect'
+        ).distinct()
+    )
+    denied = {
+        (user_id, resource_name, action_name)
+        for user_id, resource_name, action_name, effect in rows
+        if effect == RolePermission.DENY
+    }
+    return {
+        (
+            user_id,
+            resource_name,
+            action_name,
+            RolePermission.DENY
+            if (user_id, resource_name, action_name) in denied
+            else RolePermission.ALLOW
+        )
+        for user_id, resource_name, action_name, _ in rows
+    }
+
+
+def stored_permissions(user_ids=None):
+    """Множество строк, записанных в таблицу."""
+    queryset = UserEffectivePermission.objects.all()
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    return set(
+        queryset.values_list(
+            'user_id', 'resource_name', 'action_name', 'effect'
+        )
+    )
+
+
+def _apply(missing, extra):
+    if extra:
+        for user_id, resource_name, action_name, effect in extra:
+            UserEffectivePermission.objects.filter(
+                user_id=user_id,
+                resource_name=resource_name,
+                action_name=action_name,
+                effect=effect
+            ).delete()
+    if missing:
+        UserEffectivePermission.objects.bulk_create(
+            [
+                UserEffectivePermission(
+                    user_id=user_id,
+                    resource_name=resource_name,
+                    action_name=action_name,
+                    effect=effect
+                )
+                for user_id, resource_name, action_name, effect in missing
+            ],
+            batch_size=REBUILD_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+
+
+def refresh_users(user_ids):
+    """
+    Привести строки пользователей `user_ids` к правам их ролей.
+
+    Возвращает множество id пользователей, чьи строки изменились.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return set()
+    granted = granted_permissions(user_ids)
+    stored = stored_permissions(user_ids)
+    missing, extra = granted - stored, stored - granted
+    _apply(missing, extra)
+    return {row[0] for row in missing | extra}
+
+
+def users_of_roles(role_ids):
+    """
+    id пользователей, которым назначены роли `role_ids` или роли,
+    наследующие от них.
+    """
+    return set(
+        UserRole.objects.filter(
+            role__ancestor_links__ancestor_id__in=role_ids
+        ).values_list('user_id', flat=True).distinct()
+    )
+
+
+def users_of_permission(permission):
+    """
+    Пользователи, чьи строки может затронуть изменение права: владельцы
+    ролей с этим правом и все, у кого право уже записано в таблицу.
+    """
+    role_ids = RolePermission.objects.filter(
+        permission=permission
+    ).values_list('role_id', flat=True)
+    return users_of_roles(role_ids) | users_with_names(
+        resource_name=permission.resource.name,
+        action_name=permission.action.name
+    )
+
+
+def users_with_names(**names):
+    """Пользователи, у которых в таблице есть строки с этими именами."""
+    return set(
+        UserEffectivePermission.objects.filter(**names).values_list(
+            'user_id', flat=True
+        ).distinct()
+    )
+
+
+def rename(field, old_name, new_name):
+    """Переименовать ресурс или действие в таблице одним UPDATE."""
+    return UserEffectivePermission.objects.filter(
+        **{field: old_name}
+    ).update(**{field: new_name})
+
+
+def verify(user_ids=None):
+    """Вернуть пару (недостающие строки, лишние строки)."""
+    granted = granted_permissions(user_ids)
+    stored = stored_permissions(user_ids)
+    return granted - stored, stored - granted
+
+
+def rebuild():
+    """Полностью перестроить таблицу. Возвращает число строк."""
+    with transaction.atomic():
+        UserEffectivePermission.objects.all().delete()
+        rows = granted_permissions()
+        _apply(rows, set())
+    return len(rows)
@@ -0,0 +1,356 @@
+"""
+Битовый движок проверки прав доступа.
+
+Каждому праву (Permission) и каждой роли назначается плотный номер
+бита. Роль компилируется в целочисленные маски разрешенных и
+запрещенных прав, а права пользователя — в побитовое ИЛИ разрешающих
+масок его ролей за вычетом ИЛИ запрещающих: запрет любой роли сильнее
+разрешения любой другой. Проверка права сводится
+к проверке одного бита, а на пользователя в кэше приходится несколько
+байт. Целые числа Python имеют произвольную длину и хранятся массивом
+машинных слов, поэтому та же маска служит битсетом и при тысячах прав.
+
+Права с шаблоном '*' вместо ресурса или действия ('products.*', '*.read')
+при компиляции разворачиваются в биты всех подходящих прав. Для имен,
+которых нет в каталоге прав, шаблоны пользователя собираются в
+двухуровневый словарь ресурс -> действия, и проверка остается
+константной: не больше четырех поисков в словарях.
+"""
+from collections import namedtuple
+
+from .cache import masks_key, permission_cache, stamp_key
+from .models import (
+    Permission,
+    WILDCARD,
+    Role,
+    RoleClosure,
+    RolePermission,
+    UserRole
+)
+from .version import current_version, reset_version
+
+
+# Скомпилированная политика:
+# version — версия RBAC, по которой скомпилирована политика;
+# reset_version — версия последнего сброса прав всех пользователей:
+# маски, построенные раньше, недействительны;
+# bits — 'resource.action' -> номер бита права;
+# role_masks — id роли -> маска разрешенных прав роли и ее предков;
+# role_denies — id роли -> маска запрещенных прав роли и ее предков;
+# role_bits — id роли -> номер бита роли;
+# role_sets — id роли -> маска ролей: сама роль и все ее предки;
+# role_wildcards — id роли -> шаблоны (resource, action) роли и предков;
+# role_deny_wildcards — то же для запрещающих шаблонов;
+# role_names — имя роли -> id роли.
+CompiledPolicy = namedtuple('CompiledPolicy', (
+    'version',
+    'reset_version',
+    'bits',
+    'role_masks',
+    'role_denies',
+    'role_bits',
+    'role_sets',
+    'role_wildcards',
+    'role_deny_wildcards',
+    'role_names',
+))
+
+# Права пользователя: маска прав (разрешения за вычетом запретов), маска
+# ролей, разрешающие и запрещающие шаблоны в виде словарей
+# ресурс -> frozenset действий
+UserMasks = namedtuple('UserMasks', (
+    'version', 'permissions', 'roles', 'wildcards', 'denied_wildcards'
+))
+
+
+def is_wildcard(resource_name, action_name):
+    return WILDCARD in (resource_name, action_name)
+
+
+def _freeze(patterns):
+    return {key: frozenset(values) for key, values in patterns.items()}
+
+
+def match_wildcards(wildcards, resource_name, action_name):
+    """Подходит ли пара (resource, action) под один из шаблонов."""
+    for resource in (resource_name, WILDCARD):
+        actions = wildcards.get(resource)
+        if actions and (action_name in actions or WILDCARD in actions):
+            return True
+    return False
+
+
+class RBACEngine:
+    """Компиляция политики и проверка прав по битовым маскам."""
+
+    POLICY_KEY = 'policy'
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def compile(self, version):
+        """
+        Построить политику по текущему состоянию БД (пять запросов).
+
+        `version` — версия RBAC, прочитанная до чтения данных: если
+        политика изменится во время компиляции, результат будет помечен
+        старой версией и перестроен при следующей проверке.
+        """
+        permissions = list(
+            Permission.objects.order_by('id').values_list(
+                'id', 'resource__name', 'action__name'
+            )
+        )
+        keys = tuple(
+            f'{resource}.{action}' for _, resource, action in permissions
+        )
+        bit_of_permission = {
+            permission_id: bit
+            for bit, (permission_id, _, _) in enumerate(permissions)
+        }
+        # Шаблон выдает все подходящие права каталога
+        grant_masks = {}
+        wildcards = {}
+        for permission_id, resource, action in permissions:
+            if not is_wildcard(resource, action):
+                continue
+            wildcards[permission_id] = (resource, action)
+            matcher = {resource: frozenset((action,))}
+            grant_masks[permission_id] = sum(
+                1 << bit
+                for bit, (_, other_resource, other_action)
+                in enumerate(permissions)
+                if match_wildcards(matcher, other_resource, other_action)
+            )
+
+        roles = list(Role.objects.order_by('id').values_list('id', 'name'))
+        role_bits = {role_id: bit for bit, (role_id, _) in enumerate(roles)}
+        # Разрешения и запреты собираются в отдельные маски и шаблоны
+        effects = (RolePermission.ALLOW, RolePermission.DENY)
+        direct_masks = {effect: {} for effect in effects}
+        direct_wildcards = {effect: {} for effect in effects}
+        for role_id, permission_id, effect in (
+            RolePermission.objects.values_list(
+                'role_id', 'permission_id', 'effect'
+            )
+        ):
+            bit = bit_of_permission.get(permission_id)
+            if bit is None:
+                continue
+            masks = direct_masks[effect]
+            masks[role_id] = masks.get(role_id, 0) | (
+                grant_masks.get(permission_id, 1 << bit)
+            )
+            if permission_id in wildcards:
+                direct_wildcards[effect].setdefault(role_id, set()).add(
+                    wildcards[permission_id]
+                )
+
+        # Роль получает права и запреты всех предков из замыкания
+        # иерархии, а в маску ролей пользователя попадают и
+        # унаследованные роли
+        role_masks = {effect: {} for effect in effects}
+        role_wildcards = {effect: {} for effect in effects}
+        role_sets = {role_id: 0 for role_id, _ in roles}
+        for ancestor_id, descendant_id in RoleClosure.objects.values_list(
+            'ancestor_id', 'descendant_id'
+        ):
+            if descendant_id not in role_sets or ancestor_id not in role_bits:
+                continue
+            role_sets[descendant_id] |= 1 << role_bits[ancestor_id]
+            for effect in effects:
+                mask = direct_masks[effect].get(ancestor_id)
+                if mask:
+                    role_masks[effect][descendant_id] = (
+                        role_masks[effect].get(descendant_id, 0) | mask
+                    )
+                patterns = direct_wildcards[effect].get(ancestor_id)
+                if patterns:
+                    role_wildcards[effect].setdefault(
+                        descendant_id, set()
+                    ).update(patterns)
+
+        return CompiledPolicy(
+            version=version,
+            reset_version=reset_version(),
+            bits={key: bit for bit, key in enumerate(keys)},
+            role_masks=role_masks[RolePermission.ALLOW],
+            role_denies=role_masks[RolePermission.DENY],
+            role_bits=role_bits,
+            role_sets=role_sets,
+            role_wildcards=_freeze(role_wildcards[RolePermission.ALLOW]),
+            role_deny_wildcards=_freeze(role_wildcards[RolePermission.DENY]),
+            role_names={name: role_id for role_id, name in roles},
+        )
+
+    def policy(self):
+        """
+        Текущая политика.
+
+        Кэшированная политика используется, пока ее версия совпадает с
+        глобальной версией RBAC; иначе она компилируется заново.
+        """
+        version = current_version()
+        policy = self.cache.get(self.POLICY_KEY)
+        if policy is None or policy.version != version:
+            policy = self.compile(version)
+            self.cache.set(self.POLICY_KEY, policy)
+        return policy
+
+    def user_masks(self, user, policy=None):
+        """
+        Маски прав и ролей пользователя.
+
+        Маски запоминаются на экземпляре пользователя до конца запроса
+        и кэшируются вместе с версией политики, по которой построены.
+        """
+        policy = policy or self.policy()
+        masks = getattr(user, '_rbac_masks', None)
+        if masks is not None and masks.version == policy.version:
+            return masks
+
+        keys = (masks_key(user.pk), stamp_key(user.pk))
+        cached = self.cache.get_many(keys)
+        masks = cached.get(keys[0])
+        if not self.is_current(masks, cached.get(keys[1]), policy):
+            masks = self.compute_user_masks(user.pk, policy)
+            self.cache.set(keys[0], masks)
+        user._rbac_masks = masks
+        return masks
+
+    @staticmethod
+    def is_current(masks, stamp, policy):
+        """
+        Действительны ли кэшированные маски для политики `policy`: они
+        построены не раньше последнего общего сброса и последнего сброса
+        прав этого пользователя (`stamp`) и не по более новой политике.
+        """
+        return masks is not None and max(
+            policy.reset_version, stamp or 0
+        ) <= masks.version <= policy.version
+
+    def user_masks_many(self, user_ids, policy=None):
+        """
+        Маски нескольких пользователей: одно чтение кэша и не больше
+        одного запроса для пользователей, которых в кэше нет.
+        """
+        policy = policy or self.policy()
+        keys = {user_id: masks_key(user_id) for user_id in user_ids}
+        cached = self.cache.get_many([
+            key
+            for user_id in user_ids
+            for key in (keys[user_id], stamp_key(user_id))
+        ])
+        masks = {}
+        stale = []
+        for user_id, key in keys.items():
+            entry = cached.get(key)
+            if self.is_current(entry, cached.get(stamp_key(user_id)), policy):
+                masks[user_id] = entry
+            else:
+                stale.append(user_id)
+        if stale:
+            role_ids = {user_id: [] for user_id in stale}
+            for user_id, role_id in UserRole.objects.filter(
+                user_id__in=stale
+            ).values_list('user_id', 'role_id'):
+                role_ids[user_id].append(role_id)
+            computed = {
+                user_id: self.masks_from_roles(roles, policy)
+                for user_id, roles in role_ids.items()
+            }
+            self.cache.set_many({
+                keys[user_id]: value for user_id, value in computed.items()
+            })
+            masks.update(computed)
+        return masks
+
+    @classmethod
+    def compute_user_masks(cls, user_id, policy):
+        role_ids = UserRole.objects.filter(
+            user_id=user_id
+        ).values_list('role_id', flat=True)
+        return cls.masks_from_roles(role_ids, policy)
+
+    @staticmethod
+    def masks_from_roles(role_ids, policy):
+        """
+        Маски прав и ролей и шаблоны для набора id ролей.
+
+        Маски разрешений и запретов ролей объединяются отдельно, и
+        запреты вычитаются из разрешений один раз, здесь.
+        """
+        allow_mask = 0
+        deny_mask = 0
+        roles_mask = 0
+        wildcards = {}
+        denied_wildcards = {}
+        for role_id in role_ids:
+            allow_mask |= policy.role_masks.get(role_id, 0)
+            deny_mask |= policy.role_denies.get(role_id, 0)
+            roles_mask |= policy.role_sets.get(role_id, 0)
+            for resource, action in policy.role_wildcards.get(role_id, ()):
+                wildcards.setdefault(resource, set()).add(action)
+            for resource, action in policy.role_deny_wildcards.get(
+                role_id, ()
+            ):
+                denied_wildcards.setdefault(resource, set()).add(action)
+        return UserMasks(
+            policy.version,
+            allow_mask & ~deny_mask,
+            roles_mask,
+            _freeze(wildcards),
+            _freeze(denied_wildcards)
+        )
+
+    @staticmethod
+    def allows(policy, masks, resource_name, action_name):
+        """
+        Решение по маскам: бит права из каталога, а для имен вне
+        каталога — шаблоны пользователя, где запрет сильнее разрешения.
+        """
+        bit = policy.bits.get(f'{resource_name}.{action_name}')
+        if bit is not None:
+            return bool(masks.permissions >> bit & 1)
+        return match_wildcards(
+            masks.wildcards, resource_name, action_name
+        ) and not match_wildcards(
+            masks.denied_wildcards, resource_name, action_name
+        )
+
+    def has_permission(self, user, resource_name, action_name):
+        """Проверить право 'resource.action' одним битом."""
+        policy = self.policy()
+        return self.allows(
+            policy,
+            self.user_masks(user, policy),
+            resource_name,
+            action_name
+        )
+
+    def has_permissions(self, user, pairs):
+        """
+        Проверить несколько пар (resource, action) по одной маске.
+
+        Возвращает словарь {(resource, action): bool}.
+        """
+        policy = self.policy()
+        masks = self.user_masks(user, policy)
+        return {
+            (resource_name, action_name): self.allows(
+                policy, masks, resource_name, action_name
+            )
+            for resource_name, action_name in pairs
+        }
+
+    def has_role(self, user, role_name):
+        """Проверить роль пользователя, включая унаследованные роли."""
+        policy = self.policy()
+        role_id = policy.role_names.get(role_name)
+        if role_id is None:
+            return False
+        bit = policy.role_bits[role_id]
+        return bool(self.user_masks(user, policy).roles >> bit & 1)
+
+
+rbac_engine = RBACEngine(permission_cache)
@@ -0,0 +1,94 @@
+"""
+Иерархия ролей.
+
+Роль наследует права своих родителей. Транзитивное замыкание иерархии
+хранится в таблице role_closure и пересчитывается при каждом изменении
+связей, поэтому проверки прав и расчет действующих прав читают уже
+развернутые пары (предок, потомок), и глубина иерархии не влияет на
+время обработки запроса.
+"""
+from collections import deque
+
+from .models import Role, RoleClosure, RoleParent
+
+
+def compute_closure():
+    """
+    Рассчитать замыкание по текущим связям.
+
+    Возвращает словарь {(предок, потомок): глубина}. Обход в ширину
+    устойчив к циклам, даже если они попали в БД в обход проверок.
+    """
+    parents = {}
+    for role_id, parent_id in RoleParent.objects.values_list(
+        'role_id', 'parent_id'
+    ):
+        parents.setdefault(role_id, []).append(parent_id)
+
+    closure = {}
+    for role_id in Role.objects.values_list('id', flat=True):
+        depths = {role_id: 0}
+        queue = deque([role_id])
+        while queue:
+            current = queue.popleft()
+            for parent_id in parents.get(current, ()):
+                if parent_id not in depths:
+                    depths[parent_id] = depths[current] + 1
+                    queue.append(parent_id)
+        for ancestor_id, depth in depths.items():
+            closure[(ancestor_id, role_id)] = depth
+    return closure
+
+
+def refresh_closure():
+    """
+    Привести таблицу role_closure к текущим связям.
+
+    Меняются только отличающиеся строки. Возвращает число вставленных,
+    удаленных и обновленных строк.
+    """
+    desired = compute_closure()
+    stored = {
+        (ancestor_id, descendant_id): (pk, depth)
+        for pk, ancestor_id, descendant_id, depth
+        in RoleClosure.objects.values_list(
+            'pk', 'ancestor_id', 'descendant_id', 'depth'
+        )
+    }
+    extra = [pk for pair, (pk, _) in stored.items() if pair not in desired]
+    missing = [
+        RoleClosure(ancestor_id=ancestor_id, descendant_id=descendant_id,
+                    depth=depth)
+        for (ancestor_id, descendant_id), depth in desired.items()
+        if (ancestor_id, descendant_id) not in stored
+    ]
+    changed = [
+        RoleClosure(pk=stored[pair][0], depth=depth)
+        for pair, depth in desired.items()
+        if pair in stored and stored[pair][1] != depth
+    ]
+    if extra:
+        RoleClosure.objects.filter(pk__in=extra).delete()
+    if missing:
+        RoleClosure.objects.bulk_create(missing, ignore_conflicts=True)
+    if changed:
+        RoleClosure.objects.bulk_update(changed, ['depth'])
+    return len(missing), len(extra), len(changed)
+
+
+def descendants(role_ids):
+    """id ролей, наследующих от `role_ids`, включая сами роли."""
+    return set(
+        RoleClosure.objects.filter(ancestor_id__in=role_ids).values_list(
+            'descendant_id', flat=True
+        )
+    )
+
+
+def ancestors(role_ids):
+    """id ролей, от которых наследуют `role_ids`, включая сами роли."""
+    return set(
+        RoleClosure.objects.filter(descendant_id__in=role_ids).values_list(
+            'ancestor_id', flat=True
+        )
+    )
@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 from apps.authorization.models import (
-    Resource, Action, Permission, Role, RolePermission, UserRole
+    WILDCARD, Resource, Action, Permission, Role, RolePermission, UserRole
 )
 
 User = get_user_model()
@@ -64,7 +64,7 @@ class Command(BaseCommand):
         # Create Roles
         self.stdout.write('Creating roles...')
 
-        # Admin role - all permissions
+        # Admin role - all permissions through a single '*.*' grant
         admin_role, created = Role.objects.get_or_create(
             name='Admin',
             defaults={
@@ -72,11 +72,13 @@ class Command(BaseCommand):
             }
         )
         if created:
-            for permission in permissions.values():
-                RolePermission.objects.create(
-                    role=admin_role,
-                    permission=permission
-                )
+            permission, _ = Permission.get_or_create_permission(
+                WILDCARD, WILDCARD
+            )
+            RolePermission.objects.create(
+                role=admin_role,
+                permission=permission
+            )
             self.stdout.write(self.style.SUCCESS('  Created role: Admin'))
 
         # Manager role - products.*, orders.read, orders.list
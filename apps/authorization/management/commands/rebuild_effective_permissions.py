@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.authorization.effective import rebuild, verify
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify the user_effective_permissions table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only compare the table with role assignments'
+        )
+        parser.add_argument(
+            '--show',
+            type=int,
+            default=20,
+            help='Maximum number of differing rows to print'
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            self.stdout.write('Rebuilding effective permissions...')
+            count = rebuild()
+            self.stdout.write(
+                self.style.SUCCESS(f'Stored {count} effective permissions')
+            )
+            return
+
+        self.stdout.write('Verifying effective permissions...')
+        missing, extra = verify()
+        for label, rows in (('missing', missing), ('extra', extra)):
+            for user_id, resource, action, effect in sorted(
+                rows
+            )[:options['show']]:
+                self.stdout.write(
+                    f'  {label}: user {user_id} {effect} {resource}.{action}'
+                )
+        if missing or extra:
+            raise CommandError(
+                f'Table is out of sync: {len(missing)} missing, '
+                f'{len(extra)} extra rows; run without --verify to rebuild'
+            )
+        self.stdout.write(self.style.SUCCESS('Table is in sync'))
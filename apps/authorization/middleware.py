@@ -0,0 +1,19 @@
+from .version import current_version, request_scope
+
+
+class RBACVersionMiddleware:
+    """
+    Читает версию RBAC один раз за запрос и добавляет ее в заголовок
+    X-RBAC-Version для отладки.
+    """
+
+    header = 'X-RBAC-Version'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with request_scope():
+            response = self.get_response(request)
+            response[self.header] = str(current_version())
+        return response
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:14
+
+from django.db import migrations, models
+
+
+def create_version_row(apps, schema_editor):
+    RBACVersion = apps.get_model("authorization", "RBACVersion")
+    RBACVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("authorization", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RBACVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.BigIntegerField(default=1, verbose_name="Version")),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Updated at"),
+                ),
+            ],
+            options={
+                "verbose_name": "RBAC Version",
+                "verbose_name_plural": "RBAC Version",
+                "db_table": "rbac_version",
+            },
+        ),
+        migrations.RunPython(create_version_row, migrations.RunPython.noop),
+    ]
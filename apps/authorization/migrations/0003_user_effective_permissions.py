@@ -0,0 +1,83 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate(apps, schema_editor):
+    UserRole = apps.get_model("authorization", "UserRole")
+    UserEffectivePermission = apps.get_model("authorization", "UserEffectivePermission")
+    rows = (
+        UserRole.objects.filter(role__permissions__isnull=False)
+        .values_list(
+            "user_id",
+            "role__permissions__resource__name",
+            "role__permissions__action__name",
+        )
+        .distinct()
+    )
+    UserEffectivePermission.objects.bulk_create(
+        [
+            UserEffectivePermission(
+                user_id=user_id, resource_name=resource, action_name=action
+            )
+            for user_id, resource, action in rows
+        ],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("authorization", "0002_rbac_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserEffectivePermission",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "resource_name",
+                    models.CharField(max_length=100, verbose_name="Resource name"),
+                ),
+                (
+                    "action_name",
+                    models.CharField(max_length=50, verbose_name="Action name"),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="effective_permissions",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="User",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "User Effective Permission",
+                "verbose_name_plural": "User Effective Permissions",
+                "db_table": "user_effective_permissions",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="usereffectivepermission",
+            constraint=models.UniqueConstraint(
+                fields=("user", "resource_name", "action_name"),
+                name="user_effective_permission_uniq",
+            ),
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,124 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate(apps, schema_editor):
+    Role = apps.get_model("authorization", "Role")
+    RoleClosure = apps.get_model("authorization", "RoleClosure")
+    RoleClosure.objects.bulk_create(
+        [
+            RoleClosure(ancestor_id=role_id, descendant_id=role_id, depth=0)
+            for role_id in Role.objects.values_list("id", flat=True)
+        ],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("authorization", "0003_user_effective_permissions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RoleParent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created at"),
+                ),
+                (
+                    "parent",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="child_links",
+                        to="authorization.role",
+                        verbose_name="Parent role",
+                    ),
+                ),
+                (
+                    "role",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="parent_links",
+                        to="authorization.role",
+                        verbose_name="Role",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Role Parent",
+                "verbose_name_plural": "Role Parents",
+                "db_table": "role_parents",
+                "unique_together": {("role", "parent")},
+            },
+        ),
+        migrations.AddField(
+            model_name="role",
+            name="parents",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="children",
+                through="authorization.RoleParent",
+                to="authorization.role",
+                verbose_name="Parent roles",
+            ),
+        ),
+        migrations.CreateModel(
+            name="RoleClosure",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("depth", models.PositiveIntegerField(default=0, verbose_name="Depth")),
+                (
+                    "ancestor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="descendant_links",
+                        to="authorization.role",
+                        verbose_name="Ancestor",
+                    ),
+                ),
+                (
+                    "descendant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ancestor_links",
+                        to="authorization.role",
+                        verbose_name="Descendant",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Role Closure",
+                "verbose_name_plural": "Role Closure",
+                "db_table": "role_closure",
+                "indexes": [
+                    models.Index(
+                        fields=["descendant", "ancestor"],
+                        name="role_closur_descend_39718d_idx",
+                    )
+                ],
+                "unique_together": {("ancestor", "descendant")},
+            },
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("authorization", "0004_role_hierarchy"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rolepermission",
+            name="effect",
+            field=models.CharField(
+                choices=[("allow", "Allow"), ("deny", "Deny")],
+                default="allow",
+                max_length=5,
+                verbose_name="Effect",
+            ),
+        ),
+        migrations.AddField(
+            model_name="usereffectivepermission",
+            name="effect",
+            field=models.CharField(
+                choices=[("allow", "Allow"), ("deny", "Deny")],
+                default="allow",
+                max_length=5,
+                verbose_name="Effect",
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:10
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_version(apps, schema_editor):
+    RBACVersion = apps.get_model("authorization", "RBACVersion")
+    RBACVersion.objects.update(reset_version=F("version"))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("authorization", "0005_permission_effect"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rbacversion",
+            name="reset_version",
+            field=models.BigIntegerField(
+                default=1, verbose_name="Reset version"
+            ),
+        ),
+        migrations.RunPython(copy_version, migrations.RunPython.noop),
+    ]
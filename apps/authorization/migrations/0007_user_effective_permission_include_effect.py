@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 07:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authorization", "0006_rbac_reset_version"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="usereffectivepermission",
+            name="user_effective_permission_uniq",
+        ),
+        migrations.AddConstraint(
+            model_name="usereffectivepermission",
+            constraint=models.UniqueConstraint(
+                fields=("user", "resource_name", "action_name"),
+                include=("effect",),
+                name="user_effective_permission_uniq",
+            ),
+        ),
+    ]
@@ -1,7 +1,12 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.conf import settings
 
 
+# Resource or action name that matches every name in a permission grant
+WILDCARD = '*'
+
+
 class Resource(models.Model):
     """Resource model - represents a business object/resource."""
 
@@ -88,14 +93,29 @@ class Permission(models.Model):
     def __str__(self):
         return f"{self.resource.name}.{self.action.name}"
 
+    @property
+    def is_wildcard(self):
+        """Whether the permission grants a whole resource or action."""
+        return WILDCARD in (self.resource.name, self.action.name)
+
     @classmethod
     def get_or_create_permission(cls, resource_name, action_name):
-        """Get or create a permission by resource and action names."""
-        resource, _ = Resource.objects.get_or_create(name=resource_name)
-        action, _ = Action.objects.get_or_create(name=action_name)
-        permission, created = cls.objects.get_or_create(
-            resource=resource,
-            action=action
+        """
+        Get or create a permission by resource and action names.
+
+        Names are resolved through the in-memory permission catalog, so
+        an existing permission costs a single primary key lookup.
+        """
+        from .catalog import permission_catalog
+
+        permission_id, created = (
+            permission_catalog.get_or_create_permission_id(
+                resource_name,
+                action_name
+            )
+        )
+        permission = cls.objects.select_related('resource', 'action').get(
+            pk=permission_id
         )
         return permission, created
 
@@ -119,6 +139,15 @@ class Role(models.Model):
         related_name='roles',
         verbose_name='Permissions'
     )
+    parents = models.ManyToManyField(
+        'self',
+        through='RoleParent',
+        through_fields=('role', 'parent'),
+        symmetrical=False,
+        related_name='children',
+        blank=True,
+        verbose_name='Parent roles'
+    )
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Created at'
@@ -138,15 +167,127 @@ class Role(models.Model):
         return self.name
 
     def has_permission(self, resource_name, action_name):
-        """Check if role has a specific permission."""
-        return self.permissions.filter(
-            resource__name=resource_name,
-            action__name=action_name
+        """
+        Check if role has a specific permission, including inherited
+        and wildcard grants. A matching deny grant wins over any allow.
+        """
+        from .catalog import permission_catalog
+
+        permission_ids = permission_catalog.matching_permission_ids(
+            resource_name,
+            action_name
+        )
+        if not permission_ids:
+            return False
+        effects = set(
+            RolePermission.objects.filter(
+                role__descendant_links__descendant=self,
+                permission_id__in=permission_ids
+            ).values_list('effect', flat=True)
+        )
+        return RolePermission.ALLOW in effects and (
+            RolePermission.DENY not in effects
+        )
+
+
+class RoleParent(models.Model):
+    """Inheritance edge: `role` inherits all permissions of `parent`."""
+
+    role = models.ForeignKey(
+        Role,
+        on_delete=models.CASCADE,
+        related_name='parent_links',
+        verbose_name='Role'
+    )
+    parent = models.ForeignKey(
+        Role,
+        on_delete=models.CASCADE,
+        related_name='child_links',
+        verbose_name='Parent role'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Created at'
+    )
+
+    class Meta:
+        verbose_name = 'Role Parent'
+        verbose_name_plural = 'Role Parents'
+        db_table = 'role_parents'
+        unique_together = [['role', 'parent']]
+
+    def __str__(self):
+        return f"{self.role.name} -> {self.parent.name}"
+
+    @staticmethod
+    def creates_cycle(role_id, parent_id):
+        """Check if inheriting from `parent_id` would close a cycle."""
+        return role_id == parent_id or RoleClosure.objects.filter(
+            ancestor_id=role_id,
+            descendant_id=parent_id
         ).exists()
 
+    def clean(self):
+        if self.creates_cycle(self.role_id, self.parent_id):
+            raise ValidationError(
+                'Role inheritance cycle: '
+                f'{self.parent} already inherits from {self.role}'
+            )
+
+    def save(self, *args, **kwargs):
+        self.clean()
+        super().save(*args, **kwargs)
+
+
+class RoleClosure(models.Model):
+    """
+    Transitive closure of role inheritance.
+
+    One row per (ancestor, descendant) pair, including every role with
+    itself at depth 0; `descendant` inherits the permissions of
+    `ancestor`. Maintained by apps.authorization.hierarchy.
+    """
+
+    ancestor = models.ForeignKey(
+        Role,
+        on_delete=models.CASCADE,
+        related_name='descendant_links',
+        verbose_name='Ancestor'
+    )
+    descendant = models.ForeignKey(
+        Role,
+        on_delete=models.CASCADE,
+        related_name='ancestor_links',
+        verbose_name='Descendant'
+    )
+    depth = models.PositiveIntegerField(default=0, verbose_name='Depth')
+
+    class Meta:
+        verbose_name = 'Role Closure'
+        verbose_name_plural = 'Role Closure'
+        db_table = 'role_closure'
+        unique_together = [['ancestor', 'descendant']]
+        indexes = [models.Index(fields=['descendant', 'ancestor'])]
+
+    def __str__(self):
+        return f"{self.descendant_id} <- {self.ancestor_id} ({self.depth})"
+
 
 class RolePermission(models.Model):
-    """Intermediate model for Role-Permission relationship."""
+    """
+    Intermediate model for Role-Permission relationship.
+
+    A grant either allows or denies the permission. Deny always wins:
+    a user is allowed a resource action only if some role (own or
+    inherited) allows a matching permission and no role denies one.
+    """
+
+    ALLOW = 'allow'
+    DENY = 'deny'
+    EFFECT_CHOICES = [
+        (ALLOW, 'Allow'),
+        (DENY, 'Deny'),
+    ]
 
     role = models.ForeignKey(
         Role,
@@ -160,6 +301,12 @@ class RolePermission(models.Model):
         related_name='role_permissions',
         verbose_name='Permission'
     )
+    effect = models.CharField(
+        max_length=5,
+        choices=EFFECT_CHOICES,
+        default=ALLOW,
+        verbose_name='Effect'
+    )
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Created at'
@@ -172,6 +319,8 @@ class RolePermission(models.Model):
         unique_together = [['role', 'permission']]
 
     def __str__(self):
+        if self.effect == self.DENY:
+            return f"{self.role.name} - deny {self.permission}"
         return f"{self.role.name} - {self.permission}"
 
 
@@ -204,3 +353,86 @@ class UserRole(models.Model):
 
     def __str__(self):
         return f"{self.user.email} - {self.role.name}"
+
+
+class UserEffectivePermission(models.Model):
+    """
+    Denormalized grant of a resource action to a user through any role.
+
+    Names may be wildcards. A row is a deny if any of the user's roles
+    denies that permission; a check is allowed when a matching allow
+    row exists and no matching deny row does.
+
+    Maintained incrementally from UserRole and RolePermission changes by
+    apps.authorization.effective; rebuild it with
+    `manage.py rebuild_effective_permissions`.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='effective_permissions',
+        # Covered by the leading column of the unique index
+        db_index=False,
+        verbose_name='User'
+    )
+    resource_name = models.CharField(
+        max_length=100,
+        verbose_name='Resource name'
+    )
+    action_name = models.CharField(
+        max_length=50,
+        verbose_name='Action name'
+    )
+    effect = models.CharField(
+        max_length=5,
+        choices=RolePermission.EFFECT_CHOICES,
+        default=RolePermission.ALLOW,
+        verbose_name='Effect'
+    )
+
+    class Meta:
+        verbose_name = 'User Effective Permission'
+        verbose_name_plural = 'User Effective Permissions'
+        db_table = 'user_effective_permissions'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'resource_name', 'action_name'],
+                # Effect is stored in the index so checks are index-only
+                include=['effect'],
+                name='user_effective_permission_uniq'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.resource_name}.{self.action_name}"
+
+
+class RBACVersion(models.Model):
+    """
+    Single-row counter of RBAC changes.
+
+    Incremented on every change of roles, permissions and their
+    assignments; workers compare it with the version of their cached
+    permission data to decide whether to rebuild it. reset_version is
+    the last version that invalidated cached permissions of all users;
+    bulk assignment changes invalidate only the affected users.
+    """
+
+    version = models.BigIntegerField(default=1, verbose_name='Version')
+    reset_version = models.BigIntegerField(
+        default=1,
+        verbose_name='Reset version'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Updated at'
+    )
+
+    class Meta:
+        verbose_name = 'RBAC Version'
+        verbose_name_plural = 'RBAC Version'
+        db_table = 'rbac_version'
+
+    def __str__(self):
+        return str(self.version)
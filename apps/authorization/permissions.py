@@ -1,5 +1,7 @@
 from rest_framework import permissions
-from .models import UserRole
+from django.conf import settings
+from .engine import match_wildcards, rbac_engine
+from .models import WILDCARD, RolePermission, UserEffectivePermission
 
 
 class HasResourcePermission(permissions.BasePermission):
@@ -43,14 +45,7 @@ class HasResourcePermission(permissions.BasePermission):
         if not resource:
             return False
 
-        # Check if user has any role with the required permission
-        user_roles = UserRole.objects.filter(
-            user=request.user,
-            role__permissions__resource__name=resource,
-            role__permissions__action__name=action
-        ).exists()
-
-        return user_roles
+        return check_resource_permission(request.user, resource, action)
 
 
 def check_resource_permission(user, resource_name, action_name):
@@ -58,17 +53,130 @@ def check_resource_permission(user, resource_name, action_name):
     Helper function to check if user has permission for a resource and action.
     Returns True if user has permission, False otherwise.
     """
+    pair = (resource_name, action_name)
+    return check_resource_permissions(user, [pair])[pair]
+
+
+def check_resource_permissions(user, pairs):
+    """
+    Check several (resource, action) pairs for a user at once.
+
+    Returns a dict mapping each pair to True or False. All pairs are
+    answered from one read of the user's compiled permission mask, or
+    with one query when PERMISSION_CHECK_SOURCE is 'table'.
+    """
+    pairs = [tuple(pair) for pair in pairs]
     if not user or not user.is_authenticated:
-        return False
+        return {pair: False for pair in pairs}
 
     if user.is_superuser:
-        return True
+        return {pair: True for pair in pairs}
+
+    if getattr(settings, 'PERMISSION_CHECK_SOURCE', 'engine') == 'table':
+        # Index lookups in the materialized effective permissions;
+        # wildcard rows are matched together with exact ones
+        if len(pairs) == 1:
+            (resource_name, action_name), = pairs
+            effects = set(UserEffectivePermission.objects.filter(
+                user_id=user.pk,
+                resource_name__in=(resource_name, WILDCARD),
+                action_name__in=(action_name, WILDCARD)
+            ).values_list('effect', flat=True))
+            return {pairs[0]: RolePermission.ALLOW in effects and (
+                RolePermission.DENY not in effects
+            )}
+        grants = _table_grants(
+            UserEffectivePermission.objects.filter(
+                user_id=user.pk,
+                resource_name__in=_with_wildcard(pairs, 0),
+                action_name__in=_with_wildcard(pairs, 1)
+            ).values_list('resource_name', 'action_name', 'effect')
+        )
+        return {pair: _table_allows(grants, *pair) for pair in pairs}
+
+    # Bit tests against the user's compiled permission mask
+    return rbac_engine.has_permissions(user, pairs)
+
+
+def check_users_resource_permissions(checks):
+    """
+    Evaluate a batch of (user_id, resource, action) checks.
+
+    Returns a list of booleans in the order of `checks`. Users are loaded
+    with one query; their grants come from one cache read of the
+    compiled masks (plus one query for users missing from the cache), or
+    from one query in table mode. Unknown and inactive users are denied.
+    """
+    from django.contrib.auth import get_user_model
+
+    checks = [tuple(check) for check in checks]
+    user_ids = {user_id for user_id, _, _ in checks}
+    users = {
+        pk: (is_active, is_superuser)
+        for pk, is_active, is_superuser in get_user_model().objects.filter(
+            pk__in=user_ids
+        ).values_list('pk', 'is_active', 'is_superuser')
+    }
+    active = {pk for pk, (is_active, _) in users.items() if is_active}
+    superusers = {pk for pk in active if users[pk][1]}
+    regular = active - superusers
+
+    if getattr(settings, 'PERMISSION_CHECK_SOURCE', 'engine') == 'table':
+        rows = {user_id: [] for user_id in regular}
+        if regular:
+            pairs = [(resource, action) for _, resource, action in checks]
+            queryset = UserEffectivePermission.objects.filter(
+                user_id__in=regular,
+                resource_name__in=_with_wildcard(pairs, 0),
+                action_name__in=_with_wildcard(pairs, 1)
+            ).values_list(
+                'user_id', 'resource_name', 'action_name', 'effect'
+            )
+            for user_id, resource, action, effect in queryset:
+                rows[user_id].append((resource, action, effect))
+        grants = {
+            user_id: _table_grants(names) for user_id, names in rows.items()
+        }
+
+        def allowed(user_id, resource, action):
+            return _table_allows(grants[user_id], resource, action)
+    else:
+        policy = rbac_engine.policy()
+        masks = rbac_engine.user_masks_many(regular, policy) if regular else {}
+
+        def allowed(user_id, resource, action):
+            return rbac_engine.allows(policy, masks[user_id], resource, action)
+
+    return [
+        user_id in superusers
+        or (user_id in regular and allowed(user_id, resource, action))
+        for user_id, resource, action in checks
+    ]
 
-    return UserRole.objects.filter(
-        user=user,
-        role__permissions__resource__name=resource_name,
-        role__permissions__action__name=action_name
-    ).exists()
+
+def _with_wildcard(pairs, index):
+    """Names at `index` of the pairs plus the wildcard name."""
+    return {pair[index] for pair in pairs} | {WILDCARD}
+
+
+def _table_grants(rows):
+    """
+    Group (resource, action, effect) rows into allow and deny matchers
+    of the form resource -> actions.
+    """
+    grants = {RolePermission.ALLOW: {}, RolePermission.DENY: {}}
+    for resource_name, action_name, effect in rows:
+        grants[effect].setdefault(resource_name, set()).add(action_name)
+    return grants
+
+
+def _table_allows(grants, resource_name, action_name):
+    """A matching allow row and no matching deny row; deny wins."""
+    return match_wildcards(
+        grants[RolePermission.ALLOW], resource_name, action_name
+    ) and not match_wildcards(
+        grants[RolePermission.DENY], resource_name, action_name
+    )
 
 
 class IsAdmin(permissions.BasePermission):
@@ -81,7 +189,46 @@ class IsAdmin(permissions.BasePermission):
         if request.user.is_superuser:
             return True
 
-        return UserRole.objects.filter(
-            user=request.user,
-            role__name='Admin'
-        ).exists()
+        return rbac_engine.has_role(request.user, 'Admin')
+
+
+class _MultipleResourcePermissions(permissions.BasePermission):
+    """
+    Base for permission classes that check several resource actions.
+    Pairs come from the constructor or the view's `resource_permissions`.
+    """
+
+    def __init__(self, pairs=None):
+        self.pairs = pairs
+
+    def get_pairs(self, view):
+        return self.pairs or getattr(view, 'resource_permissions', None) or []
+
+    def has_permission(self, request, view):
+        pairs = self.get_pairs(view)
+        if not pairs:
+            return False
+        decisions = check_resource_permissions(request.user, pairs)
+        return self.combine(decisions.values())
+
+
+class HasAnyResourcePermission(_MultipleResourcePermissions):
+    """
+    Allow access if the user has at least one of the resource actions.
+    Usage: permission_classes = [
+        HasAnyResourcePermission([('orders', 'update'), ('orders', 'delete')])
+    ]
+    """
+
+    combine = staticmethod(any)
+
+
+class HasAllResourcePermissions(_MultipleResourcePermissions):
+    """
+    Allow access only if the user has every listed resource action.
+    Usage: permission_classes = [
+        HasAllResourcePermissions([('reports', 'read'), ('orders', 'list')])
+    ]
+    """
+
+    combine = staticmethod(all)
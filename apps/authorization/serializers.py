@@ -1,7 +1,15 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
 from rest_framework import serializers
+from . import hierarchy
+from .assignments import sync_role_permissions
+from .catalog import permission_catalog
 from .models import (
     Resource, Action, Permission, Role, RolePermission, UserRole
 )
+from .signals import batch_update
+from .version import bump_version
 from apps.users.models import CustomUser
 
 
@@ -60,46 +68,102 @@ class RoleSerializer(serializers.ModelSerializer):
         write_only=True,
         required=False
     )
+    denied_permission_ids = serializers.SerializerMethodField()
+    parents = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    parent_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        write_only=True,
+        required=False
+    )
 
     class Meta:
         model = Role
         fields = (
             'id', 'name', 'description', 'permissions',
-            'permission_ids', 'created_at', 'updated_at'
+            'permission_ids', 'denied_permission_ids', 'parents', 'parent_ids',
+            'created_at', 'updated_at'
         )
         read_only_fields = ('id', 'created_at', 'updated_at')
 
+    def get_denied_permission_ids(self, obj):
+        """id разрешений, которые роль явно запрещает."""
+        return [
+            role_permission.permission_id
+            for role_permission in obj.role_permissions.all()
+            if role_permission.effect == RolePermission.DENY
+        ]
+
+    def validate_parent_ids(self, value):
+        """Проверка существования родительских ролей и отсутствия циклов."""
+        parent_ids = set(value)
+        existing = set(
+            Role.objects.filter(id__in=parent_ids).values_list('id', flat=True)
+        )
+        if existing != parent_ids:
+            raise serializers.ValidationError(
+                "Родительская роль не существует."
+            )
+        if self.instance is not None and parent_ids & hierarchy.descendants(
+            [self.instance.pk]
+        ):
+            raise serializers.ValidationError(
+                "Роль не может наследовать от себя или своих потомков."
+            )
+        return sorted(parent_ids)
+
+    def validate_permission_ids(self, value):
+        """Проверка существования разрешений."""
+        permission_ids = set(value)
+        existing = set(
+            Permission.objects.filter(id__in=permission_ids).values_list(
+                'id', flat=True
+            )
+        )
+        unknown = sorted(permission_ids - existing)
+        if unknown:
+            raise serializers.ValidationError(
+                f"Разрешения не существуют: {', '.join(map(str, unknown))}."
+            )
+        return existing
+
+    @transaction.atomic
     def create(self, validated_data):
         permission_ids = validated_data.pop('permission_ids', [])
+        parent_ids = validated_data.pop('parent_ids', [])
         role = Role.objects.create(**validated_data)
 
+        if parent_ids:
+            role.parents.set(parent_ids)
+
         if permission_ids:
-            permissions = Permission.objects.filter(id__in=permission_ids)
-            for permission in permissions:
-                RolePermission.objects.create(
-                    role=role,
-                    permission=permission
-                )
+            sync_role_permissions(role, permission_ids)
 
         return role
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         permission_ids = validated_data.pop('permission_ids', None)
-
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
+        parent_ids = validated_data.pop('parent_ids', None)
+
+        changed = [
+            attr for attr, value in validated_data.items()
+            if getattr(instance, attr) != value
+        ]
+        if changed:
+            for attr in changed:
+                setattr(instance, attr, validated_data[attr])
+            with batch_update():
+                instance.save(update_fields=changed + ['updated_at'])
+            # Role names live in the policy only, cached user masks
+            # refer to role ids and stay valid
+            bump_version(set())
 
         if permission_ids is not None:
-            # Clear existing permissions
-            RolePermission.objects.filter(role=instance).delete()
-            # Add new permissions
-            permissions = Permission.objects.filter(id__in=permission_ids)
-            for permission in permissions:
-                RolePermission.objects.create(
-                    role=instance,
-                    permission=permission
-                )
+            # Only the difference is written, deny grants are kept
+            sync_role_permissions(instance, permission_ids)
+
+        if parent_ids is not None:
+            instance.parents.set(parent_ids)
 
         return instance
 
@@ -161,6 +225,74 @@ class AssignRoleToUserSerializer(serializers.Serializer):
         return user_role
 
 
+class BulkRoleAssignmentSerializer(serializers.Serializer):
+    """
+    Массовое назначение или отзыв ролей.
+
+    Пользователи выбираются списком id, списком email и (или) доменом
+    email; существование пользователей и ролей проверяется одним
+    запросом к каждой таблице.
+    """
+
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        max_length=getattr(settings, 'AUTHZ_BULK_ASSIGN_MAX_USERS', 10000)
+    )
+    emails = serializers.ListField(
+        child=serializers.EmailField(),
+        required=False,
+        max_length=getattr(settings, 'AUTHZ_BULK_ASSIGN_MAX_USERS', 10000)
+    )
+    email_domain = serializers.CharField(required=False)
+    role_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False
+    )
+
+    def validate(self, attrs):
+        """Найти пользователей и роли, отделив несуществующие."""
+        user_ids = set(attrs.get('user_ids', []))
+        emails = {
+            CustomUser.objects.normalize_email(email)
+            for email in attrs.get('emails', [])
+        }
+        email_domain = attrs.get('email_domain', '').lstrip('@')
+        if not user_ids and not emails and not email_domain:
+            raise serializers.ValidationError(
+                "Необходимо указать user_ids, emails или email_domain."
+            )
+
+        query = Q(id__in=user_ids) | Q(email__in=emails)
+        if email_domain:
+            query |= Q(email__iendswith=f'@{email_domain}')
+        found = dict(
+            CustomUser.objects.filter(query).values_list('id', 'email')
+        )
+        role_ids = set(attrs['role_ids'])
+        roles = set(
+            Role.objects.filter(id__in=role_ids).values_list('id', flat=True)
+        )
+
+        found_emails = set(found.values())
+        attrs['users'] = set(found)
+        attrs['roles'] = roles
+        attrs['invalid_user_ids'] = sorted(user_ids - set(found))
+        attrs['invalid_emails'] = sorted(emails - found_emails)
+        attrs['invalid_role_ids'] = sorted(role_ids - roles)
+        return attrs
+
+    @property
+    def invalid(self):
+        """Несуществующие пользователи и роли из запроса."""
+        return {
+            key: self.validated_data[key]
+            for key in (
+                'invalid_user_ids', 'invalid_emails', 'invalid_role_ids'
+            )
+        }
+
+
 class AssignPermissionToRoleSerializer(serializers.Serializer):
     """Сериализатор для назначения разрешения роли."""
 
@@ -168,6 +300,10 @@ class AssignPermissionToRoleSerializer(serializers.Serializer):
     permission_id = serializers.IntegerField(required=False)
     resource_name = serializers.CharField(required=False)
     action_name = serializers.CharField(required=False)
+    effect = serializers.ChoiceField(
+        choices=RolePermission.EFFECT_CHOICES,
+        default=RolePermission.ALLOW
+    )
 
     def validate(self, attrs):
         """Проверка наличия permission_id или resource_name+action_name."""
@@ -184,25 +320,43 @@ class AssignPermissionToRoleSerializer(serializers.Serializer):
 
     def create(self, validated_data):
         """Создание назначения RolePermission."""
-        from .models import Permission
-
         role_id = validated_data['role_id']
 
         if validated_data.get('permission_id'):
             permission_id = validated_data['permission_id']
         else:
-            permission, _ = Permission.get_or_create_permission(
-                validated_data['resource_name'],
-                validated_data['action_name']
+            permission_id, _ = (
+                permission_catalog.get_or_create_permission_id(
+                    validated_data['resource_name'],
+                    validated_data['action_name']
+                )
             )
-            permission_id = permission.id
 
         role_permission, created = RolePermission.objects.get_or_create(
             role_id=role_id,
-            permission_id=permission_id
+            permission_id=permission_id,
+            defaults={'effect': validated_data['effect']}
         )
         if not created:
             raise serializers.ValidationError(
                 "Роль уже имеет это разрешение."
             )
         return role_permission
+
+
+class DecisionCheckSerializer(serializers.Serializer):
+    """Одна проверка: может ли пользователь выполнить действие над ресурсом."""
+
+    user_id = serializers.IntegerField()
+    resource = serializers.CharField(max_length=100)
+    action = serializers.CharField(max_length=50)
+
+
+class BatchDecisionSerializer(serializers.Serializer):
+    """Пакет проверок прав доступа."""
+
+    checks = serializers.ListField(
+        child=DecisionCheckSerializer(),
+        allow_empty=False,
+        max_length=getattr(settings, 'AUTHZ_BATCH_MAX_CHECKS', 5000)
+    )
@@ -0,0 +1,210 @@
+"""
+Сигналы для инвалидации кэша прав доступа и поддержки таблиц
+иерархии ролей и действующих прав пользователей.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save
+)
+from django.dispatch import receiver
+
+from . import effective, hierarchy
+from .models import (
+    Action,
+    Permission,
+    Resource,
+    Role,
+    RoleClosure,
+    RoleParent,
+    RolePermission,
+    UserRole
+)
+from .version import bump_version
+
+
+_state = threading.local()
+
+
+@contextmanager
+def batch_update():
+    """
+    Отключить построчные обработчики назначений на время пакетной
+    операции. Вызывающий код сам увеличивает версию RBAC один раз и
+    пересчитывает права только затронутых пользователей.
+    """
+    previous = getattr(_state, 'batch', False)
+    _state.batch = True
+    try:
+        yield
+    finally:
+        _state.batch = previous
+
+
+def _in_batch():
+    return getattr(_state, 'batch', False)
+
+
+@receiver([post_save, post_delete], sender=UserRole)
+@receiver([post_save, post_delete], sender=RolePermission)
+@receiver([post_save, post_delete], sender=Role)
+@receiver([post_save, post_delete], sender=RoleParent)
+@receiver([post_save, post_delete], sender=Permission)
+@receiver([post_save, post_delete], sender=Resource)
+@receiver([post_save, post_delete], sender=Action)
+def invalidate_permission_cache(sender, **kwargs):
+    """
+    Увеличить версию RBAC при изменении ролей, прав, ресурсов, действий
+    и их назначений. Через эти сигналы проходят все пути записи:
+    ViewSet'ы, сериализаторы и админка Django.
+    """
+    if not _in_batch():
+        bump_version()
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def invalidate_permission_cache_m2m(sender, instance, action, reverse,
+                                    pk_set, **kwargs):
+    """Role.permissions.add()/remove()/clear() не вызывают post_save."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    bump_version()
+    if reverse:
+        # instance — право, pk_set — роли (None при clear)
+        user_ids = effective.users_of_permission(instance)
+        if pk_set:
+            user_ids |= effective.users_of_roles(pk_set)
+    else:
+        user_ids = effective.users_of_roles([instance.pk])
+    effective.refresh_users(user_ids)
+
+
+def _cascaded(kwargs):
+    """
+    Удаление — часть каскада от роли или пользователя. Роль пересчитывает
+    затронутых пользователей после своего удаления, а строки удаленного
+    пользователя удаляются каскадом.
+    """
+    return isinstance(kwargs.get('origin'), (Role, get_user_model()))
+
+
+@receiver([post_save, post_delete], sender=UserRole)
+def refresh_user_effective_permissions(sender, instance, **kwargs):
+    """Пересчитать действующие права пользователя."""
+    if not _cascaded(kwargs) and not _in_batch():
+        effective.refresh_users([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=RolePermission)
+def refresh_role_effective_permissions(sender, instance, **kwargs):
+    """Пересчитать действующие права пользователей роли и ее потомков."""
+    if not _cascaded(kwargs) and not _in_batch():
+        effective.refresh_users(effective.users_of_roles([instance.role_id]))
+
+
+@receiver(post_save, sender=Role)
+def add_role_to_closure(sender, instance, created, **kwargs):
+    """Новая роль — строка замыкания с самой собой."""
+    if created:
+        RoleClosure.objects.get_or_create(
+            ancestor=instance,
+            descendant=instance,
+            defaults={'depth': 0}
+        )
+
+
+@receiver(pre_delete, sender=Role)
+def remember_role_users(sender, instance, **kwargs):
+    """Запомнить пользователей роли и ее потомков до каскадного удаления."""
+    instance._affected_users = effective.users_of_roles([instance.pk])
+
+
+@receiver(post_delete, sender=Role)
+def refresh_after_role_delete(sender, instance, **kwargs):
+    """Пересчитать замыкание и права после удаления роли."""
+    hierarchy.refresh_closure()
+    effective.refresh_users(getattr(instance, '_affected_users', ()))
+
+
+@receiver([post_save, post_delete], sender=RoleParent)
+def refresh_role_hierarchy(sender, instance, **kwargs):
+    """Пересчитать замыкание и права пользователей ветки иерархии."""
+    if _cascaded(kwargs):
+        return
+    hierarchy.refresh_closure()
+    effective.refresh_users(effective.users_of_roles([instance.role_id]))
+
+
+@receiver(m2m_changed, sender=Role.parents.through)
+def refresh_role_hierarchy_m2m(sender, instance, action, reverse, pk_set,
+                               **kwargs):
+    """
+    Role.parents.add()/remove()/clear() обходят save() связи, поэтому
+    проверка циклов и пересчет выполняются здесь.
+    """
+    if action == 'pre_add':
+        for pk in pk_set:
+            role_id, parent_id = (pk, instance.pk) if reverse else (
+                instance.pk, pk
+            )
+            if RoleParent.creates_cycle(role_id, parent_id):
+                raise ValidationError('Цикл в иерархии ролей')
+        return
+    if action == 'pre_clear' and reverse:
+        instance._cleared_children = list(
+            instance.children.values_list('pk', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        role_ids = [instance.pk]
+    elif pk_set is not None:
+        role_ids = list(pk_set)
+    else:
+        role_ids = getattr(instance, '_cleared_children', [])
+    hierarchy.refresh_closure()
+    bump_version()
+    effective.refresh_users(effective.users_of_roles(role_ids))
+
+
+@receiver(pre_save, sender=Resource)
+@receiver(pre_save, sender=Action)
+@receiver(pre_save, sender=Permission)
+def remember_previous_state(sender, instance, **kwargs):
+    """Запомнить имя или права до сохранения, чтобы обновить таблицу."""
+    if instance.pk is None:
+        return
+    previous = sender.objects.filter(pk=instance.pk).first()
+    instance._previous = previous
+
+
+@receiver(post_save, sender=Resource)
+@receiver(post_save, sender=Action)
+def rename_effective_permissions(sender, instance, created, **kwargs):
+    """Переименование ресурса или действия — один UPDATE таблицы."""
+    previous = getattr(instance, '_previous', None)
+    if created or previous is None or previous.name == instance.name:
+        return
+    field = 'resource_name' if sender is Resource else 'action_name'
+    effective.rename(field, previous.name, instance.name)
+
+
+@receiver(post_save, sender=Permission)
+def refresh_permission_effective_permissions(sender, instance, created,
+                                             **kwargs):
+    """Смена ресурса или действия у права затрагивает владельцев ролей."""
+    previous = getattr(instance, '_previous', None)
+    if created or previous is None:
+        return
+    user_ids = effective.users_of_permission(instance)
+    user_ids |= effective.users_of_permission(previous)
+    effective.refresh_users(user_ids)
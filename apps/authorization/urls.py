@@ -5,7 +5,9 @@ from .views import (
     ActionViewSet,
     PermissionViewSet,
     RoleViewSet,
-    UserRoleViewSet
+    UserRoleViewSet,
+    MetricsViewSet,
+    DecisionViewSet
 )
 
 router = DefaultRouter()
@@ -14,6 +16,8 @@ router.register(r'actions', ActionViewSet, basename='action')
 router.register(r'permissions', PermissionViewSet, basename='permission')
 router.register(r'roles', RoleViewSet, basename='role')
 router.register(r'user-roles', UserRoleViewSet, basename='user-role')
+router.register(r'metrics', MetricsViewSet, basename='metrics')
+router.register(r'decisions', DecisionViewSet, basename='decision')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -0,0 +1,129 @@
+"""
+Глобальная версия RBAC.
+
+Версия хранится в однострочной таблице rbac_version и дублируется в
+общем кэше. Любое изменение ролей, прав и их назначений увеличивает ее
+в той же транзакции, а после фиксации публикует новое значение в кэше.
+Читатели сверяют с ней одно целое число и перестраивают кэшированные
+данные о правах, только когда версия изменилась. Процесс держит версию
+в L1 не дольше PERMISSION_CACHE_LOCAL_TTL секунд, а в пределах запроса
+она читается один раз (request_scope).
+
+Обычное изменение сбрасывает кэшированные права всех пользователей и
+запоминает версию сброса (reset_version). Пакетные изменения назначений
+знают затронутых пользователей и сбрасывают только их записи; маски
+остальных пользователей, построенные не раньше последнего сброса,
+остаются действительными.
+"""
+import threading
+from contextlib import contextmanager
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from config.cache import TTLCache
+
+from .cache import invalidate_users, permission_cache
+from .models import RBACVersion
+
+
+VERSION_CACHE_KEY = 'rbac:version'
+ROW_ID = 1
+
+# Версия в памяти процесса; устаревает не дольше, чем маски в L1
+_local = TTLCache(
+    max_size=1,
+    ttl=getattr(settings, 'PERMISSION_CACHE_LOCAL_TTL', 5)
+)
+# Версия, зафиксированная на время текущего запроса
+_request = threading.local()
+
+
+def _shared_cache():
+    return caches[getattr(settings, 'AUTH_CACHE_ALIAS', 'default')]
+
+
+def _read_row():
+    row, _ = RBACVersion.objects.get_or_create(pk=ROW_ID)
+    return row.version
+
+
+def reset_version():
+    """Версия последнего изменения, сбросившего права всех пользователей."""
+    row, _ = RBACVersion.objects.get_or_create(pk=ROW_ID)
+    return row.reset_version
+
+
+@contextmanager
+def request_scope():
+    """
+    Читать версию RBAC не больше одного раза за запрос: все проверки
+    прав и заголовок ответа получают одно и то же значение.
+    """
+    previous = getattr(_request, 'scope', None)
+    _request.scope = {}
+    try:
+        yield
+    finally:
+        _request.scope = previous
+
+
+def current_version():
+    """
+    Текущая версия RBAC: из запроса, из L1, из общего кэша, при
+    промахе — из БД.
+    """
+    scope = getattr(_request, 'scope', None)
+    if scope:
+        return scope['version']
+    version = _local.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache = _shared_cache()
+        version = cache.get(VERSION_CACHE_KEY)
+        if version is None:
+            version = _read_row()
+            cache.add(VERSION_CACHE_KEY, version, timeout=None)
+        _local.set(VERSION_CACHE_KEY, version)
+    if scope is not None:
+        scope['version'] = version
+    return version
+
+
+def _publish(user_ids=None):
+    version = _read_row()
+    _shared_cache().set(VERSION_CACHE_KEY, version, timeout=None)
+    # Собственные изменения процесс видит сразу
+    _local.set(VERSION_CACHE_KEY, version)
+    if getattr(_request, 'scope', None) is not None:
+        _request.scope['version'] = version
+    if user_ids is None:
+        permission_cache.invalidate_all()
+    else:
+        invalidate_users(user_ids, version)
+
+
+def bump_version(user_ids=None):
+    """
+    Увеличить версию RBAC.
+
+    Счетчик увеличивается в текущей транзакции, а кэш обновляется после
+    ее фиксации, чтобы никто не перестроил данные по незафиксированному
+    состоянию. `user_ids` передается, когда изменились только
+    назначения ролей и права ролей (но не состав ролей и прав) и
+    известны все пользователи, чьи права изменились: тогда сбрасываются
+    только их записи в кэше.
+    """
+    values = {'version': F('version') + 1, 'updated_at': timezone.now()}
+    if user_ids is None:
+        values['reset_version'] = F('version') + 1
+    else:
+        user_ids = frozenset(user_ids)
+    rows = RBACVersion.objects.filter(pk=ROW_ID)
+    if not rows.update(**values):
+        RBACVersion.objects.get_or_create(pk=ROW_ID)
+        rows.update(**values)
+    transaction.on_commit(partial(_publish, user_ids))
@@ -1,6 +1,8 @@
+from django.db.models import Prefetch
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from loguru import logger
 from .models import Resource, Action, Permission, Role, UserRole
 from .serializers import (
     ResourceSerializer,
@@ -9,9 +11,17 @@ from .serializers import (
     RoleSerializer,
     UserRoleSerializer,
     AssignRoleToUserSerializer,
-    AssignPermissionToRoleSerializer
+    AssignPermissionToRoleSerializer,
+    BulkRoleAssignmentSerializer,
+    BatchDecisionSerializer
 )
-from .permissions import IsAdmin
+from .assignments import assign_roles, revoke_roles
+from .cache import permission_cache
+from .permissions import IsAdmin, check_users_resource_permissions
+from apps.users.cache import token_cache
+from apps.users.hashing import password_hashing
+from apps.users.token_activity import token_activity
+from apps.users.token_filter import token_filter
 
 
 class ResourceViewSet(viewsets.ModelViewSet):
@@ -63,13 +73,45 @@ class PermissionViewSet(viewsets.ModelViewSet):
         )
 
 
+def role_prefetches(prefix=''):
+    """
+    Prefetch всего, что выводит RoleSerializer: права вместе с ресурсом
+    и действием, связи с эффектом и родительские роли. Список ролей
+    любой длины обходится постоянным числом запросов.
+
+    `prefix` — путь до роли, например 'role__' для назначений.
+    """
+    return (
+        Prefetch(
+            f'{prefix}permissions',
+            queryset=Permission.objects.select_related('resource', 'action')
+        ),
+        f'{prefix}role_permissions',
+        f'{prefix}parents',
+    )
+
+
 class RoleViewSet(viewsets.ModelViewSet):
     """ViewSet для управления ролями (только для администраторов)."""
 
-    queryset = Role.objects.prefetch_related('permissions').all()
+    queryset = Role.objects.prefetch_related(*role_prefetches()).all()
     serializer_class = RoleSerializer
     permission_classes = [IsAdmin]
 
+    def perform_create(self, serializer):
+        serializer.save()
+        self._reload(serializer)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        self._reload(serializer)
+
+    def _reload(self, serializer):
+        """Перечитать роль с prefetch для ответа без N+1."""
+        serializer.instance = self.get_queryset().get(
+            pk=serializer.instance.pk
+        )
+
     @action(detail=True, methods=['post'], url_path='permissions')
     def assign_permission(self, request, pk=None):
         """Назначить разрешение роли."""
@@ -120,7 +162,9 @@ class RoleViewSet(viewsets.ModelViewSet):
 class UserRoleViewSet(viewsets.ModelViewSet):
     """ViewSet для управления назначениями ролей пользователям."""
 
-    queryset = UserRole.objects.select_related('user', 'role').all()
+    queryset = UserRole.objects.select_related(
+        'user', 'role'
+    ).prefetch_related(*role_prefetches('role__')).all()
     serializer_class = UserRoleSerializer
     permission_classes = [IsAdmin]
 
@@ -131,7 +175,9 @@ class UserRoleViewSet(viewsets.ModelViewSet):
 
         if serializer.is_valid():
             user_role = serializer.save()
-            response_serializer = UserRoleSerializer(user_role)
+            response_serializer = UserRoleSerializer(
+                self.get_queryset().get(pk=user_role.pk)
+            )
             return Response(
                 response_serializer.data,
                 status=status.HTTP_201_CREATED
@@ -141,6 +187,55 @@ class UserRoleViewSet(viewsets.ModelViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    @action(detail=False, methods=['post'], url_path='bulk-assign')
+    def bulk_assign(self, request):
+        """Назначить роли множеству пользователей одним запросом."""
+        serializer = BulkRoleAssignmentSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        created, skipped = assign_roles(
+            serializer.validated_data['users'],
+            serializer.validated_data['roles']
+        )
+        return Response(self._bulk_result(
+            serializer, created=created, skipped=skipped
+        ))
+
+    @action(detail=False, methods=['post'], url_path='bulk-revoke')
+    def bulk_revoke(self, request):
+        """Отозвать роли у множества пользователей одним запросом."""
+        serializer = BulkRoleAssignmentSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        revoked, skipped = revoke_roles(
+            serializer.validated_data['users'],
+            serializer.validated_data['roles']
+        )
+        return Response(self._bulk_result(
+            serializer, revoked=revoked, skipped=skipped
+        ))
+
+    @staticmethod
+    def _bulk_result(serializer, **counts):
+        invalid = serializer.invalid
+        logger.info(
+            f"Массовое изменение ролей: {counts}, "
+            f"не найдено: {sum(map(len, invalid.values()))}"
+        )
+        return {
+            **counts,
+            'invalid': sum(map(len, invalid.values())),
+            **invalid,
+        }
+
     @action(
         detail=False,
         methods=['get'],
@@ -148,8 +243,60 @@ class UserRoleViewSet(viewsets.ModelViewSet):
     )
     def get_user_roles(self, request, user_id=None):
         """Получить все роли для конкретного пользователя."""
-        user_roles = UserRole.objects.filter(
-            user_id=user_id
-        ).select_related('role')
+        user_roles = self.get_queryset().filter(user_id=user_id)
         serializer = UserRoleSerializer(user_roles, many=True)
         return Response(serializer.data)
+
+
+class MetricsViewSet(viewsets.ViewSet):
+    """ViewSet для просмотра метрик кэшей (только для администраторов)."""
+
+    permission_classes = [IsAdmin]
+
+    def list(self, request):
+        """Получить счетчики кэшей текущего процесса."""
+        return Response({
+            'token_cache': token_cache.stats(),
+            'token_filter': token_filter.stats(),
+            'token_activity': token_activity.stats(),
+            'password_hashing': password_hashing.stats(),
+            'permission_cache': permission_cache.stats(),
+        })
+
+
+class DecisionViewSet(viewsets.ViewSet):
+    """
+    ViewSet для пакетной проверки прав доступа другими сервисами
+    (только для администраторов).
+    """
+
+    permission_classes = [IsAdmin]
+
+    def create(self, request):
+        """Вернуть решения для пакета проверок (user_id, resource, action)."""
+        serializer = BatchDecisionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        checks = [
+            (check['user_id'], check['resource'], check['action'])
+            for check in serializer.validated_data['checks']
+        ]
+        decisions = check_users_resource_permissions(checks)
+        return Response({
+            'count': len(checks),
+            'decisions': [
+                {
+                    'user_id': user_id,
+                    'resource': resource,
+                    'action': action,
+                    'allowed': allowed,
+                }
+                for (user_id, resource, action), allowed in zip(
+                    checks, decisions
+                )
+            ],
+        })
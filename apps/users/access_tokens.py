@@ -0,0 +1,182 @@
+"""
+Подписанные самодостаточные access-токены.
+
+Access-токен содержит id пользователя, срок действия и id породившего
+его токена из таблицы tokens и подписан HMAC на основе SECRET_KEY. Права
+и флаги пользователя в токен не попадают: признак суперпользователя
+читается из БД вместе с проверкой refresh-токена и хранится в той же
+отметке кэша, что и его активность.
+
+Таблица tokens остается источником истины для обновления и отзыва.
+Отзывы публикуются в общем кэше, а при промахе кэша состояние
+refresh-токена читается из БД один раз и запоминается, поэтому отзыв
+не теряется ни в другом воркере, ни после вытеснения записи.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from config.cache import TwoTierCache
+
+
+ACCESS_TOKEN_SALT = 'apps.users.access_tokens'
+
+AccessToken = namedtuple('AccessToken', (
+    'user_id',
+    'email',
+    'is_superuser',
+    'refresh_token_id',
+    'issued_at',
+    'expires_at',
+))
+
+
+class InvalidAccessToken(Exception):
+    """Подпись, формат или срок действия access-токена неверны."""
+
+
+# Состояние refresh-токенов (t:<id> — отозван, a:<id> — проверен по
+# БД как действующий, значение — признак суперпользователя) и момент
+# отзыва всех токенов пользователя (u:<id>).
+# Записи нужны только до истечения выданных access-токенов.
+revocation_cache = TwoTierCache(
+    'revoked',
+    ttl=getattr(settings, 'ACCESS_TOKEN_LIFETIME_MINUTES', 15) * 60,
+    local_ttl=getattr(settings, 'TOKEN_CACHE_LOCAL_TTL', 5),
+    local_max_size=getattr(settings, 'TOKEN_CACHE_MAX_SIZE', 10000),
+    version=2,
+    cache_missing=True,
+)
+
+
+def issue_access_token(token):
+    """
+    Выпустить access-токен для refresh-токена `token`.
+
+    Возвращает пару (строка токена, срок действия). Срок не превышает
+    срок действия самого refresh-токена.
+    """
+    lifetime = timedelta(
+        minutes=getattr(settings, 'ACCESS_TOKEN_LIFETIME_MINUTES', 15)
+    )
+    now = timezone.now()
+    expires_at = min(now + lifetime, token.expires_at)
+    payload = {
+        'u': token.user.pk,
+        'm': token.user.email,
+        'r': token.pk,
+        'i': int(now.timestamp()),
+        'e': int(expires_at.timestamp()),
+    }
+    value = signing.dumps(payload, salt=ACCESS_TOKEN_SALT)
+    return value, expires_at
+
+
+def verify_access_token(value):
+    """Проверить подпись, срок действия и отзыв access-токена."""
+    try:
+        payload = signing.loads(value, salt=ACCESS_TOKEN_SALT)
+        access = AccessToken(
+            user_id=payload['u'],
+            email=payload['m'],
+            is_superuser=False,
+            refresh_token_id=payload['r'],
+            issued_at=payload['i'],
+            expires_at=payload['e'],
+        )
+    except (signing.BadSignature, KeyError, TypeError):
+        raise InvalidAccessToken('Неверный токен')
+
+    if access.expires_at <= timezone.now().timestamp():
+        raise InvalidAccessToken('Токен истек')
+
+    is_superuser = refresh_token_state(access)
+    if is_superuser is None:
+        raise InvalidAccessToken('Токен отозван')
+    return access._replace(is_superuser=is_superuser)
+
+
+def refresh_token_state(access):
+    """
+    Проверить отзыв refresh-токена и всех токенов пользователя.
+
+    Возвращает None, если токен отозван, иначе признак суперпользователя.
+    Если кэш ничего не знает о refresh-токене, решение принимается по
+    таблице tokens: токен должен существовать, быть активным, не
+    истекшим и принадлежать активному пользователю.
+    """
+    token_key = f't:{access.refresh_token_id}'
+    active_key = f'a:{access.refresh_token_id}'
+    user_key = f'u:{access.user_id}'
+    state = revocation_cache.get_many([token_key, active_key, user_key])
+    if token_key in state:
+        return None
+    if access.issued_at <= state.get(user_key, -1):
+        return None
+    if active_key in state:
+        return state[active_key]
+
+    is_superuser = _refresh_token_superuser(access.refresh_token_id)
+    if is_superuser is None:
+        revoke_refresh_token(access.refresh_token_id)
+        return None
+    revocation_cache.set(active_key, is_superuser)
+    return is_superuser
+
+
+def _refresh_token_superuser(token_id):
+    """Признак суперпользователя владельца действующего токена или None."""
+    from .models import Token
+
+    return Token.objects.filter(
+        pk=token_id,
+        is_active=True,
+        expires_at__gt=timezone.now(),
+        user__is_active=True
+    ).values_list('user__is_superuser', flat=True).first()
+
+
+def revoke_refresh_token(token_id):
+    """Отозвать access-токены, выпущенные для refresh-токена."""
+    revoke_refresh_tokens([token_id])
+
+
+def revoke_refresh_tokens(token_ids):
+    """Отозвать access-токены нескольких refresh-токенов одним запросом."""
+    revocation_cache.set_many({
+        f't:{token_id}': True for token_id in token_ids
+    })
+    revocation_cache.delete_many([f'a:{token_id}' for token_id in token_ids])
+
+
+def revoke_user(user_id, token_ids=()):
+    """
+    Отозвать все access-токены пользователя, выпущенные до этого момента.
+
+    Отметки a: для `token_ids` сбрасываются, чтобы access-токены,
+    выпущенные после отзыва, заново прочитали флаги пользователя из БД.
+    """
+    revocation_cache.set(f'u:{user_id}', int(timezone.now().timestamp()))
+    if token_ids:
+        revocation_cache.delete_many([
+            f'a:{token_id}' for token_id in token_ids
+        ])
+
+
+def access_token_user(access):
+    """
+    Собрать пользователя из проверенного access-токена без обращения к БД.
+
+    Признак суперпользователя берется из состояния refresh-токена,
+    а не из подписанных данных.
+    """
+    from .models import CustomUser
+
+    return CustomUser.from_db(
+        CustomUser.objects.db,
+        ('id', 'email', 'is_active', 'is_superuser'),
+        (access.user_id, access.email, True, access.is_superuser),
+    )
@@ -45,8 +45,11 @@ class UserProfileAdmin(admin.ModelAdmin):
 @admin.register(Token)
 class TokenAdmin(admin.ModelAdmin):
     """Админ-интерфейс для Token."""
-    list_display = ('user', 'token', 'created_at', 'expires_at', 'is_active')
+    list_display = (
+        'user', 'selector', 'created_at', 'expires_at', 'last_used_at',
+        'is_active'
+    )
     list_filter = ('is_active', 'created_at', 'expires_at')
-    search_fields = ('user__email', 'token')
-    readonly_fields = ('token', 'created_at')
+    search_fields = ('user__email', 'selector', 'token')
+    readonly_fields = ('token', 'selector', 'created_at', 'last_used_at')
     ordering = ('-created_at',)
@@ -0,0 +1,10 @@
+from django.urls import path, include
+from rest_framework.routers import SimpleRouter
+from .views import UserImportViewSet
+
+router = SimpleRouter()
+router.register(r'user-imports', UserImportViewSet, basename='user-import')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
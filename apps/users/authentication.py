@@ -1,6 +1,16 @@
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import authentication, exceptions
 from loguru import logger
+from .access_tokens import (
+    InvalidAccessToken,
+    access_token_user,
+    verify_access_token
+)
+from .cache import token_cache
 from .models import Token
+from .token_activity import token_activity
+from .token_filter import token_filter
 
 
 class CustomTokenAuthentication(authentication.BaseAuthentication):
@@ -20,20 +30,54 @@ class CustomTokenAuthentication(authentication.BaseAuthentication):
             logger.warning("Неверный формат заголовка авторизации")
             return None
 
+        if auth_type.lower() == 'bearer':
+            return self.authenticate_access_token(token_string)
+
         if auth_type.lower() != 'token':
             logger.debug(f"Неподдерживаемый тип авторизации: {auth_type}")
             return None
 
-        try:
-            token = Token.objects.select_related('user').get(
-                token=token_string,
-                is_active=True
-            )
-            logger.debug(f"Токен найден для пользователя: {token.user.email}")
-        except Token.DoesNotExist:
-            logger.warning(f"Попытка аутентификации с неверным токеном")
+        return self.authenticate_token(token_string)
+
+    def get_lookup_filters(self):
+        """
+        Дополнительные условия поиска токена.
+
+        В секционированном режиме условие по expires_at позволяет
+        PostgreSQL просматривать только живые секции; истекший токен
+        при этом отклоняется как неверный.
+        """
+        filters = {'is_active': True}
+        if getattr(settings, 'TOKEN_PARTITIONING', False):
+            filters['expires_at__gt'] = timezone.now()
+        return filters
+
+    def authenticate_token(self, token_string):
+        """Аутентификация по токену из таблицы tokens."""
+        identifier, _ = Token.split_token(token_string)
+        if not token_filter.might_exist(identifier):
+            logger.warning("Отклонен неизвестный токен (фильтр токенов)")
             raise exceptions.AuthenticationFailed('Неверный токен')
 
+        cached = token_cache.get(token_string)
+        if cached is not None:
+            user, token = cached
+            logger.debug(f"Токен найден в кэше для пользователя: {user.email}")
+        else:
+            try:
+                token = Token.find(
+                    token_string,
+                    queryset=Token.objects.select_related('user'),
+                    **self.get_lookup_filters()
+                )
+                logger.debug(
+                    f"Токен найден для пользователя: {token.user.email}"
+                )
+            except Token.DoesNotExist:
+                logger.warning(f"Попытка аутентификации с неверным токеном")
+                raise exceptions.AuthenticationFailed('Неверный токен')
+            token_cache.set(token)
+
         # Проверка истечения токена
         if token.is_expired():
             logger.info(f"Токен истек для пользователя: {token.user.email}")
@@ -49,5 +93,18 @@ class CustomTokenAuthentication(authentication.BaseAuthentication):
                 'Учетная запись пользователя отключена'
             )
 
+        token_activity.touch(token)
         logger.debug(f"Успешная аутентификация пользователя: {token.user.email}")
         return (token.user, token)
+
+    def authenticate_access_token(self, value):
+        """Аутентификация по подписанному access-токену без запроса к БД."""
+        try:
+            access = verify_access_token(value)
+        except InvalidAccessToken as exc:
+            logger.warning(f"Отклонен access-токен: {exc}")
+            raise exceptions.AuthenticationFailed(str(exc))
+
+        user = access_token_user(access)
+        logger.debug(f"Успешная аутентификация пользователя: {user.email}")
+        return (user, access)
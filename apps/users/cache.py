@@ -0,0 +1,175 @@
+"""
+Кэш токенов для CustomTokenAuthentication.
+
+Хранит компактный снимок токена и пользователя, чтобы не ходить в
+PostgreSQL на каждый аутентифицированный запрос.
+"""
+import hashlib
+from collections import namedtuple
+
+from django.conf import settings
+
+from config.cache import TwoTierCache
+
+
+TokenSnapshot = namedtuple('TokenSnapshot', (
+    'token_id',
+    'user_id',
+    'email',
+    'is_active',
+    'is_staff',
+    'is_superuser',
+    'date_joined',
+    'last_login',
+    'selector',
+    'verifier_hash',
+    'expires_at',
+    'last_used_at',
+))
+
+# Поля, которые восстанавливаются из снимка без обращения к БД
+USER_SNAPSHOT_FIELDS = (
+    'id', 'email', 'is_active', 'is_staff', 'is_superuser',
+    'date_joined', 'last_login',
+)
+TOKEN_SNAPSHOT_FIELDS = (
+    'id', 'user_id', 'token', 'selector', 'verifier_hash',
+    'expires_at', 'last_used_at', 'is_active',
+)
+
+
+class TokenCache:
+    """
+    Кэш снимков токенов поверх двухуровневого кэша.
+
+    Ключом служит SHA-256 идентификатора токена (селектора или, для
+    старого формата, самого токена), чтобы токены не попадали в общий
+    кэш. Верификатор сверяется с дайджестом из снимка при каждом
+    обращении.
+    """
+
+    def __init__(self, ttl, local_ttl, local_max_size, enabled=True):
+        self._cache = TwoTierCache(
+            'token',
+            version=3,
+            ttl=ttl,
+            local_ttl=local_ttl,
+            local_max_size=local_max_size,
+            enabled=enabled,
+        )
+
+    @property
+    def enabled(self):
+        return self._cache.enabled
+
+    @staticmethod
+    def make_key(identifier):
+        return hashlib.sha256(identifier.encode()).hexdigest()
+
+    def get(self, token_string):
+        """Вернуть пару (user, token), восстановленную из снимка, или None."""
+        from .models import Token
+
+        identifier, verifier = Token.split_token(token_string)
+        snapshot = self._cache.get(self.make_key(identifier))
+        if snapshot is None:
+            return None
+        if snapshot.verifier_hash is None:
+            if not getattr(settings, 'TOKEN_LEGACY_LOOKUP', True):
+                return None
+        elif verifier is None or not Token.verifier_matches(
+            snapshot.verifier_hash, verifier
+        ):
+            return None
+        return self._restore(snapshot, identifier)
+
+    def set(self, token):
+        """Сохранить снимок токена, загруженного вместе с пользователем."""
+        user = token.user
+        snapshot = TokenSnapshot(
+            token_id=token.pk,
+            user_id=user.pk,
+            email=user.email,
+            is_active=user.is_active,
+            is_staff=user.is_staff,
+            is_superuser=user.is_superuser,
+            date_joined=user.date_joined,
+            last_login=user.last_login,
+            selector=token.selector,
+            verifier_hash=(
+                bytes(token.verifier_hash)
+                if token.verifier_hash is not None else None
+            ),
+            expires_at=token.expires_at,
+            last_used_at=token.last_used_at,
+        )
+        self._cache.set(self.make_key(token.identifier), snapshot)
+
+    def invalidate(self, identifier):
+        """Удалить токен из кэша."""
+        self.invalidate_many([identifier])
+
+    def invalidate_many(self, identifiers):
+        """Удалить токены из кэша одним обращением к L2."""
+        self._cache.delete_many(
+            [self.make_key(identifier) for identifier in identifiers]
+        )
+
+    def invalidate_user(self, user_id, identifiers=()):
+        """
+        Удалить из кэша все токены пользователя.
+
+        L2 нельзя просканировать, поэтому из него удаляются только
+        переданные токены; L1 очищается по user_id.
+        """
+        self.invalidate_many(identifiers)
+        return self._cache.delete_local_where(
+            lambda snapshot: snapshot.user_id == user_id
+        )
+
+    def clear(self):
+        self._cache.invalidate_all()
+
+    def stats(self):
+        return self._cache.stats()
+
+    @staticmethod
+    def _restore(snapshot, identifier):
+        """
+        Собрать экземпляры моделей из снимка.
+
+        Не попавшие в снимок поля (например, password) остаются
+        отложенными: Django загрузит их при обращении, а save()
+        обновит только загруженные поля.
+        """
+        from .models import CustomUser, Token
+
+        user = CustomUser.from_db(
+            CustomUser.objects.db,
+            USER_SNAPSHOT_FIELDS,
+            (
+                snapshot.user_id, snapshot.email, snapshot.is_active,
+                snapshot.is_staff, snapshot.is_superuser,
+                snapshot.date_joined, snapshot.last_login,
+            ),
+        )
+        token = Token.from_db(
+            Token.objects.db,
+            TOKEN_SNAPSHOT_FIELDS,
+            (
+                snapshot.token_id, snapshot.user_id,
+                None if snapshot.selector else identifier,
+                snapshot.selector, snapshot.verifier_hash,
+                snapshot.expires_at, snapshot.last_used_at, True,
+            ),
+        )
+        token.user = user
+        return user, token
+
+
+token_cache = TokenCache(
+    ttl=getattr(settings, 'TOKEN_CACHE_TTL', 60),
+    local_ttl=getattr(settings, 'TOKEN_CACHE_LOCAL_TTL', 5),
+    local_max_size=getattr(settings, 'TOKEN_CACHE_MAX_SIZE', 10000),
+    enabled=getattr(settings, 'TOKEN_CACHE_ENABLED', True),
+)
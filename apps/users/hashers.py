@@ -0,0 +1,50 @@
+"""
+Хешеры паролей с настраиваемой стоимостью.
+
+Число итераций PBKDF2 задается в settings (PASSWORD_PBKDF2_ITERATIONS) и
+подбирается под железо командой `manage.py calibrate_hashers`. Алгоритм
+совпадает со стандартным pbkdf2_sha256, поэтому существующие хеши
+проверяются как прежде, а при входе пароль перехешируется с новой
+стоимостью.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 с числом итераций из настроек."""
+
+    iterations = getattr(
+        settings,
+        'PASSWORD_PBKDF2_ITERATIONS',
+        PBKDF2PasswordHasher.iterations
+    )
+
+
+def percentile(values, fraction):
+    """Перцентиль отсортированного списка (метод ближайшего ранга)."""
+    index = int(round(fraction * len(values))) - 1
+    return values[max(0, min(len(values) - 1, index))]
+
+
+def measure_verify(hasher, samples, iterations=None):
+    """
+    Измерить время проверки пароля хешером.
+
+    Возвращает отсортированный список длительностей в миллисекундах.
+    Для PBKDF2 `iterations` задает стоимость вместо настроенной.
+    """
+    password = 'calibration-password'
+    salt = hasher.salt()
+    if iterations is None:
+        encoded = hasher.encode(password, salt)
+    else:
+        encoded = hasher.encode(password, salt, iterations)
+    durations = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        hasher.verify(password, encoded)
+        durations.append((time.perf_counter() - started) * 1000)
+    return sorted(durations)
@@ -0,0 +1,207 @@
+"""
+Пул для хеширования паролей.
+
+PBKDF2 и другие хешеры тратят десятки миллисекунд процессорного времени
+на каждый вызов. Хеширование выполняется в отдельном пуле ограниченного
+размера с ограниченной очередью: при всплеске входов лишние запросы
+сразу получают отказ, а воркеры продолжают обслуживать дешевые
+запросы. Для хешеров, отпускающих GIL (PBKDF2, bcrypt, Argon2, scrypt),
+используется пул потоков, для остальных — пул процессов.
+"""
+import os
+import threading
+from concurrent import futures
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+# Алгоритмы, реализации которых отпускают GIL на время вычисления
+GIL_RELEASING_ALGORITHMS = {
+    'pbkdf2_sha256', 'pbkdf2_sha1', 'bcrypt', 'bcrypt_sha256',
+    'argon2', 'scrypt',
+}
+
+
+class HashingBusy(Exception):
+    """Очередь хеширования заполнена или ожидание превысило таймаут."""
+
+
+def _setup_worker():
+    """Инициализация процесса пула: загрузка Django при запуске через spawn."""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def _make_password(password):
+    return hashers.make_password(password)
+
+
+def _verify_password(password, encoded):
+    rehash = []
+    is_correct = hashers.check_password(
+        password,
+        encoded,
+        setter=rehash.append
+    )
+    return is_correct, bool(rehash)
+
+
+class HashingExecutor:
+    """
+    Пул хеширования с ограниченной очередью.
+
+    Одновременно принимается не больше `workers + queue_size` задач;
+    сверх этого submit() сразу выбрасывает HashingBusy. При kind='inline'
+    хеширование выполняется в вызывающем потоке, как без пула.
+    """
+
+    def __init__(self, kind, workers, queue_size, timeout):
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.workers + queue_size)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def resolve_kind(self):
+        """Тип пула с учетом хешера по умолчанию при kind='auto'."""
+        if self.kind != 'auto':
+            return self.kind
+        algorithm = hashers.get_hasher('default').algorithm
+        if algorithm in GIL_RELEASING_ALGORITHMS:
+            return 'thread'
+        return 'process'
+
+    def _get_executor(self):
+        if self._executor is not None:
+            return self._executor
+        with self._lock:
+            if self._executor is None:
+                if self.resolve_kind() == 'process':
+                    self._executor = futures.ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        initializer=_setup_worker
+                    )
+                else:
+                    self._executor = futures.ThreadPoolExecutor(
+                        max_workers=self.workers,
+                        thread_name_prefix='password-hashing'
+                    )
+        return self._executor
+
+    def run(self, fn, *args):
+        """Выполнить fn(*args) в пуле и дождаться результата."""
+        if self.kind == 'inline':
+            return fn(*args)
+        return self._result(self._submit(fn, *args))
+
+    def _submit(self, fn, *args, wait=False):
+        acquired = self._slots.acquire(
+            blocking=wait,
+            timeout=self.timeout if wait else None
+        )
+        if not acquired:
+            self.rejected += 1
+            raise HashingBusy('Очередь хеширования паролей заполнена')
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        self.submitted += 1
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _result(self, future):
+        try:
+            return future.result(timeout=self.timeout)
+        except futures.TimeoutError:
+            self.timeouts += 1
+            raise HashingBusy('Превышено время ожидания хеширования пароля')
+
+    def make_password(self, password):
+        """Хеш пароля; для None — непригодный пароль без обращения к пулу."""
+        if password is None:
+            return hashers.make_password(None)
+        return self.run(_make_password, password)
+
+    def make_passwords(self, passwords):
+        """
+        Хеши нескольких паролей (массовый импорт).
+
+        Пароли отправляются в пул окнами по `workers` штук, поэтому
+        пакет не занимает места в очереди, оставленные для входов. Места
+        в пуле ожидаются не дольше таймаута, после чего выбрасывается
+        HashingBusy.
+        """
+        if self.kind == 'inline':
+            return [_make_password(password) for password in passwords]
+        encoded = []
+        for start in range(0, len(passwords), self.workers):
+            window = [
+                self._submit(_make_password, password, wait=True)
+                for password in passwords[start:start + self.workers]
+            ]
+            encoded.extend(self._result(future) for future in window)
+        return encoded
+
+    def check_password(self, password, encoded):
+        """Проверить пароль по хешу."""
+        return self.verify_password(password, encoded)[0]
+
+    def verify_password(self, password, encoded):
+        """
+        Проверить пароль по хешу.
+
+        Возвращает пару (пароль верен, хеш нужно пересчитать): второе
+        значение истинно, если хеш получен другим хешером или с другой
+        стоимостью, чем текущий хешер по умолчанию.
+        """
+        if password is None or not hashers.is_password_usable(encoded):
+            # Непригодный хеш проверяется мгновенно
+            return False, False
+        return self.run(_verify_password, password, encoded)
+
+    def rehash_if_needed(self, user, password, must_update):
+        """
+        Перехешировать пароль пользователя после успешного входа.
+
+        Так изменение стоимости хеширования применяется постепенно, без
+        массового пересчета. При перегрузке пула перехеширование
+        откладывается до следующего входа.
+        """
+        if not must_update:
+            return False
+        try:
+            encoded = self.make_password(password)
+        except HashingBusy:
+            return False
+        type(user).objects.filter(pk=user.pk).update(password=encoded)
+        user.password = encoded
+        return True
+
+    def stats(self):
+        return {
+            'kind': self.resolve_kind(),
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'submitted': self.submitted,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+        }
+
+
+password_hashing = HashingExecutor(
+    kind=getattr(settings, 'PASSWORD_HASHING_EXECUTOR', 'auto'),
+    workers=getattr(settings, 'PASSWORD_HASHING_WORKERS', 0),
+    queue_size=getattr(settings, 'PASSWORD_HASHING_QUEUE_SIZE', 32),
+    timeout=getattr(settings, 'PASSWORD_HASHING_TIMEOUT', 5),
+)
@@ -0,0 +1,290 @@
+"""
+Потоковый массовый импорт пользователей.
+
+Записи читаются из CSV или JSONL по одной и обрабатываются пакетами:
+на пакет приходится один запрос на проверку существующих email и по
+одному bulk_create для пользователей и профилей. Открытые пароли
+хешируются параллельно: командой import_users — в собственном пуле
+процессов на всех ядрах, через API — в общем ограниченном пуле
+хеширования веб-воркера. Готовые хеши (колонка password_hash)
+переносятся без вычислений — так миграция из системы с совместимым
+форматом хешей не тратит процессорное время.
+"""
+import csv
+import json
+import os
+import time
+from concurrent import futures
+
+from django.contrib.auth import hashers
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import DatabaseError, transaction
+
+from .hashing import HashingBusy, _make_password, _setup_worker
+from .models import CustomUser, UserProfile
+
+
+FORMATS = ('csv', 'jsonl')
+
+PROFILE_FIELDS = ('first_name', 'last_name', 'middle_name')
+
+# Сколько ошибок с номерами строк сохраняется для отчета
+MAX_REPORTED_ERRORS = 20
+
+
+class InvalidRecord(Exception):
+    """Запись не может быть импортирована."""
+
+
+def detect_format(name):
+    """Формат по расширению файла: .jsonl/.ndjson — JSONL, иначе CSV."""
+    if name and name.lower().endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return 'csv'
+
+
+def read_records(stream, file_format):
+    """
+    Читать записи из текстового потока.
+
+    Выдает пары (номер строки, словарь или InvalidRecord), не загружая
+    файл целиком.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield number, InvalidRecord(f'Неверный JSON: {exc}')
+            continue
+        if not isinstance(record, dict):
+            record = InvalidRecord('Ожидался JSON-объект')
+        yield number, record
+
+
+class ImportStats:
+    """Счетчики импорта и скорость."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.read = 0
+        self.created = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.failed = 0
+        self.hashed = 0
+        self.errors = []
+
+    def error(self, number, message):
+        self.invalid += 1
+        self._report({'line': number, 'error': str(message)})
+
+    def chunk_error(self, chunk, count, message):
+        """
+        `count` пользователей пакета не вставлено из-за ошибки;
+        возвращает запись об ошибке.
+        """
+        self.failed += count
+        error = {
+            'line': chunk[0][0],
+            'last_line': chunk[-1][0],
+            'error': str(message),
+        }
+        self._report(error)
+        return error
+
+    def _report(self, error):
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(error)
+
+    def as_dict(self):
+        elapsed = time.monotonic() - self.started
+        return {
+            'read': self.read,
+            'created': self.created,
+            'skipped': self.skipped,
+            'invalid': self.invalid,
+            'failed': self.failed,
+            'hashed': self.hashed,
+            'elapsed': round(elapsed, 3),
+            'rate': round(self.created / elapsed, 1) if elapsed else 0.0,
+            'errors': list(self.errors),
+        }
+
+
+class UserImporter:
+    """
+    Импорт пользователей пакетами по `chunk_size` записей.
+
+    Открытые пароли хешируются пулом из `workers` процессов (0 — по
+    числу ядер, 1 — в текущем процессе) или, если передан `hashing`
+    (HashingExecutor), в нем без создания своего пула. Каждый пакет
+    вставляется в своей транзакции, поэтому прерванный импорт можно
+    запустить повторно: уже созданные пользователи будут пропущены.
+    """
+
+    def __init__(self, chunk_size, workers=0, hashing=None):
+        self.chunk_size = max(chunk_size, 1)
+        self.workers = workers or os.cpu_count() or 1
+        self.hashing = hashing
+
+    def run(self, records, on_progress=None):
+        """
+        Импортировать записи из read_records().
+
+        `on_progress(stats)` вызывается после каждого пакета.
+        """
+        stats = ImportStats()
+        for _ in self.iter_run(records, stats):
+            if on_progress:
+                on_progress(stats)
+        return stats
+
+    def iter_run(self, records, stats):
+        """
+        Импортировать записи, обновляя `stats`.
+
+        После каждого пакета выдает None или, если пакет не удалось
+        вставить (ошибка БД, например конкурентно созданный email, или
+        перегрузка пула хеширования), запись об ошибке; импорт
+        продолжается со следующего пакета.
+        """
+        pool = None
+        if self.hashing is None and self.workers > 1:
+            pool = futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_setup_worker
+            )
+        try:
+            chunk = []
+            for item in records:
+                chunk.append(item)
+                if len(chunk) >= self.chunk_size:
+                    yield self._import_chunk(chunk, pool, stats)
+                    chunk = []
+            if chunk:
+                yield self._import_chunk(chunk, pool, stats)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def _import_chunk(self, chunk, pool, stats):
+        stats.read += len(chunk)
+        users = {}
+        for number, record in chunk:
+            try:
+                email, user = self._build(record)
+            except InvalidRecord as exc:
+                stats.error(number, exc)
+                continue
+            if email in users:
+                stats.skipped += 1
+                continue
+            users[email] = user
+
+        existing = set(
+            CustomUser.objects.filter(email__in=users).values_list(
+                'email', flat=True
+            )
+        )
+        stats.skipped += len(existing)
+        for email in existing:
+            del users[email]
+        if not users:
+            return None
+
+        try:
+            self._hash_passwords(users.values(), pool, stats)
+            created = self._insert(users)
+        except (DatabaseError, HashingBusy) as exc:
+            return stats.chunk_error(chunk, len(users), exc)
+        stats.created += len(created)
+        return None
+
+    def _insert(self, users):
+        with transaction.atomic():
+            created = CustomUser.objects.bulk_create(
+                [user for user, _ in users.values()],
+                batch_size=self.chunk_size
+            )
+            if any(user.pk is None for user in created):
+                # БД не возвращает id из bulk_create
+                ids = dict(
+                    CustomUser.objects.filter(email__in=users).values_list(
+                        'email', 'id'
+                    )
+                )
+                for user in created:
+                    user.pk = ids[user.email]
+            UserProfile.objects.bulk_create(
+                [
+                    UserProfile(user_id=user.pk, **profile)
+                    for user, profile in users.values()
+                ],
+                batch_size=self.chunk_size
+            )
+        return created
+
+    @staticmethod
+    def _build(record):
+        """Пользователь (без хеша открытого пароля) и поля профиля."""
+        if isinstance(record, InvalidRecord):
+            raise record
+        email = CustomUser.objects.normalize_email(
+            str(record.get('email') or '').strip()
+        )
+        try:
+            validate_email(email)
+        except ValidationError:
+            raise InvalidRecord(f'Неверный email: {email!r}')
+
+        encoded = record.get('password_hash') or None
+        if encoded:
+            encoded = str(encoded)
+            try:
+                hashers.identify_hasher(encoded)
+            except ValueError:
+                raise InvalidRecord('Неизвестный формат password_hash')
+        elif not record.get('password'):
+            # Без пароля — непригодный пароль, как у create_user(None)
+            encoded = hashers.make_password(None)
+
+        user = CustomUser(email=email, password=encoded)
+        if encoded is None:
+            user._plain_password = str(record['password'])
+        profile = {
+            field: str(record.get(field) or '')[:150]
+            for field in PROFILE_FIELDS
+        }
+        return email, (user, profile)
+
+    def _hash_passwords(self, users, pool, stats):
+        pending = [
+            user for user, _ in users if hasattr(user, '_plain_password')
+        ]
+        if not pending:
+            return
+        passwords = [user._plain_password for user in pending]
+        if self.hashing is not None:
+            encoded = self.hashing.make_passwords(passwords)
+        elif pool is None:
+            encoded = map(_make_password, passwords)
+        else:
+            encoded = pool.map(
+                _make_password,
+                passwords,
+                chunksize=max(len(passwords) // (self.workers * 4), 1)
+            )
+        for user, value in zip(pending, encoded):
+            user.password = value
+            del user._plain_password
+        stats.hashed += len(pending)
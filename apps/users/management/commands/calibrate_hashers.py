@@ -0,0 +1,181 @@
+import re
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, get_hashers
+from django.core.management.base import BaseCommand, CommandError
+from apps.users.hashers import (
+    ConfigurablePBKDF2PasswordHasher,
+    measure_verify,
+    percentile
+)
+
+
+SETTING = 'PASSWORD_PBKDF2_ITERATIONS'
+
+# Default budget: the Django default of 600000 PBKDF2-SHA256 iterations
+# takes up to ~300 ms per verification on a shared server core, so a
+# lower target could only ever pick the floor
+DEFAULT_TARGET_P50_MS = 400
+DEFAULT_MAX_P99_MS = 800
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark configured password hashers and pick the PBKDF2 '
+        'iteration count for a target verify latency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target-p50-ms',
+            type=float,
+            default=DEFAULT_TARGET_P50_MS,
+            help='Target median verify latency, in milliseconds'
+        )
+        parser.add_argument(
+            '--max-p99-ms',
+            type=float,
+            default=DEFAULT_MAX_P99_MS,
+            help='Upper bound for the 99th percentile, in milliseconds'
+        )
+        parser.add_argument(
+            '--min-rate',
+            type=float,
+            default=0,
+            help='Minimum verifications per core per second (0 = no limit)'
+        )
+        parser.add_argument(
+            '--min-iterations',
+            type=int,
+            default=PBKDF2PasswordHasher.iterations,
+            help=(
+                'Never pick fewer iterations than this (default: the '
+                'Django PBKDF2 default, %(default)s)'
+            )
+        )
+        parser.add_argument(
+            '--samples',
+            type=int,
+            default=30,
+            help='Verifications measured per candidate'
+        )
+        parser.add_argument(
+            '--write',
+            action='store_true',
+            help=f'Write {SETTING} to the env file'
+        )
+        parser.add_argument(
+            '--env-file',
+            default=str(settings.BASE_DIR / '.env'),
+            help='Env file updated by --write'
+        )
+
+    def handle(self, *args, **options):
+        samples = max(options['samples'], 2)
+        self.stdout.write('Configured hashers (current cost):')
+        for hasher in get_hashers():
+            try:
+                durations = measure_verify(hasher, min(samples, 10))
+            except ValueError as exc:
+                # Library of the hasher is not installed
+                self.stdout.write(f'  {hasher.algorithm}: skipped ({exc})')
+                continue
+            self.stdout.write(self.describe(hasher.algorithm, durations))
+
+        default = get_hashers()[0]
+        if not isinstance(default, ConfigurablePBKDF2PasswordHasher):
+            raise CommandError(
+                'Calibration requires ConfigurablePBKDF2PasswordHasher '
+                'as the first entry of PASSWORD_HASHERS'
+            )
+
+        target = options['target_p50_ms']
+        if options['min_rate'] > 0:
+            target = min(target, 1000 / options['min_rate'])
+
+        # PBKDF2 cost is linear in the iteration count
+        probe = default.iterations
+        per_iteration = percentile(
+            measure_verify(default, 5, probe), 0.5
+        ) / probe
+        iterations = self.round(target / per_iteration)
+        self.stdout.write(
+            f'Calibrating {default.algorithm}: target p50 {target:.1f} ms, '
+            f'p99 <= {options["max_p99_ms"]:.1f} ms'
+        )
+        for _ in range(5):
+            durations = measure_verify(default, samples, iterations)
+            p50 = percentile(durations, 0.5)
+            p99 = percentile(durations, 0.99)
+            self.stdout.write(self.describe(iterations, durations))
+            scale = min(target / p50, options['max_p99_ms'] / p99)
+            if 0.9 <= scale <= 1.1:
+                break
+            iterations = self.round(iterations * scale)
+
+        if iterations < options['min_iterations']:
+            budget = iterations
+            iterations = options['min_iterations']
+            durations = measure_verify(default, samples, iterations)
+            p50 = percentile(durations, 0.5)
+            p99 = percentile(durations, 0.99)
+            self.stdout.write(self.describe(iterations, durations))
+            self.stdout.write(self.style.WARNING(
+                f'Latency budget cannot be met: it allows only {budget} '
+                f'iterations, below the minimum of {iterations}. At '
+                f'{iterations} iterations p50 is {p50:.1f} ms (target '
+                f'{target:.1f} ms) and p99 is {p99:.1f} ms (limit '
+                f'{options["max_p99_ms"]:.1f} ms); raise the targets or '
+                f'add CPU capacity'
+            ))
+        if iterations < PBKDF2PasswordHasher.iterations:
+            message = (
+                f'{iterations} is below the Django default of '
+                f'{PBKDF2PasswordHasher.iterations} iterations'
+            )
+            if options['write']:
+                raise CommandError(f'{message}; refusing to write it')
+            self.stdout.write(self.style.WARNING(message))
+
+        if options['write']:
+            self.write_env(options['env_file'], iterations)
+            self.stdout.write(self.style.SUCCESS(
+                f'Wrote {SETTING}={iterations} to {options["env_file"]}; '
+                f'passwords are rehashed on the next login'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Recommended: {SETTING}={iterations} '
+                f'(rerun with --write to save it)'
+            ))
+
+    @staticmethod
+    def round(iterations):
+        return max(1000, int(iterations) // 1000 * 1000)
+
+    @staticmethod
+    def describe(label, durations):
+        p50 = percentile(durations, 0.5)
+        p99 = percentile(durations, 0.99)
+        return (
+            f'  {label}: p50 {p50:.1f} ms, p99 {p99:.1f} ms, '
+            f'{1000 / p50:.1f} verifications/core/s'
+        )
+
+    @staticmethod
+    def write_env(path, iterations):
+        try:
+            with open(path) as env_file:
+                content = env_file.read()
+        except FileNotFoundError:
+            content = ''
+        line = f'{SETTING}={iterations}'
+        pattern = re.compile(rf'^{SETTING}=.*$', re.MULTILINE)
+        if pattern.search(content):
+            content = pattern.sub(line, content)
+        else:
+            if content and not content.endswith('\n'):
+                content += '\n'
+            content += line + '\n'
+        with open(path, 'w') as env_file:
+            env_file.write(content)
@@ -0,0 +1,100 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.users.sweeper import TokenSweeper, sweep_tokens, token_statistics
+
+
+class Command(BaseCommand):
+    help = 'Delete expired and inactive tokens in primary-key-range batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=getattr(settings, 'TOKEN_SWEEP_BATCH_SIZE', 5000),
+            help='Width of a primary key range deleted per statement'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=getattr(settings, 'TOKEN_SWEEP_PAUSE', 0.1),
+            help='Pause between batches, in seconds'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count tokens that would be deleted'
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Print token table statistics and exit'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and sweep every --interval seconds'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=getattr(settings, 'TOKEN_SWEEP_INTERVAL', 300),
+            help='Seconds between sweeps with --loop'
+        )
+        parser.add_argument(
+            '--verbose-batches',
+            action='store_true',
+            help='Print every batch'
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            stats = token_statistics()
+            for key, value in stats.items():
+                self.stdout.write(f'  {key}: {value}')
+            return
+
+        def progress(low, high, count):
+            if options['verbose_batches'] or count:
+                self.stdout.write(f'  ids [{low}, {high}): {count}')
+
+        if options['dry_run']:
+            self.stdout.write('Counting tokens to delete...')
+            stats = sweep_tokens(
+                batch_size=options['batch_size'],
+                pause=options['sleep'],
+                dry_run=True,
+                progress=progress
+            )
+            self.report('Would delete', stats)
+            return
+
+        sweeper = TokenSweeper(
+            interval=options['interval'],
+            batch_size=options['batch_size'],
+            pause=options['sleep']
+        )
+        if options['loop']:
+            if options['interval'] <= 0:
+                raise CommandError('--interval must be positive')
+            self.stdout.write(
+                f"Sweeping tokens every {options['interval']}s..."
+            )
+            sweeper.run_forever()
+            return
+
+        self.stdout.write('Deleting expired and inactive tokens...')
+        stats = sweeper.run_once(progress=progress)
+        if stats is None:
+            self.stdout.write(
+                self.style.WARNING('Another cleanup is running, skipped')
+            )
+            return
+        self.report('Deleted', stats)
+
+    def report(self, verb, stats):
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {stats['deleted']} tokens "
+                f"in {stats['batches']} batches"
+            )
+        )
@@ -0,0 +1,93 @@
+import io
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.users.importer import (
+    FORMATS,
+    UserImporter,
+    detect_format,
+    read_records
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream users from a CSV or JSONL file into the database in bulk. '
+        'Columns: email, password or password_hash, first_name, '
+        'last_name, middle_name'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help="Input file, or '-' to read from stdin"
+        )
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Input format (default: from the file extension)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=getattr(settings, 'USER_IMPORT_CHUNK_SIZE', 1000),
+            help='Users inserted per bulk_create'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'USER_IMPORT_WORKERS', 0),
+            help='Password hashing processes (0 = one per CPU core)'
+        )
+        parser.add_argument(
+            '--quiet-progress',
+            action='store_true',
+            help='Only print the final summary'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or detect_format(path)
+        importer = UserImporter(
+            chunk_size=options['chunk_size'],
+            workers=options['workers']
+        )
+
+        if path == '-':
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        else:
+            try:
+                stream = open(path, encoding='utf-8', newline='')
+            except OSError as exc:
+                raise CommandError(f'Cannot open {path}: {exc}')
+
+        self.stdout.write(
+            f'Importing users from {path} ({file_format}, '
+            f'chunks of {importer.chunk_size}, '
+            f'{importer.workers} hashing workers)...'
+        )
+        on_progress = None if options['quiet_progress'] else self.progress
+        with stream:
+            stats = importer.run(
+                read_records(stream, file_format),
+                on_progress=on_progress
+            )
+
+        result = stats.as_dict()
+        for error in result['errors']:
+            self.stdout.write(f"  line {error['line']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} users in {result['elapsed']}s "
+            f"({result['rate']} users/s): {result['skipped']} skipped, "
+            f"{result['invalid']} invalid, {result['failed']} failed, "
+            f"{result['hashed']} passwords hashed"
+        ))
+
+    def progress(self, stats):
+        result = stats.as_dict()
+        self.stdout.write(
+            f"  {result['read']} read, {result['created']} created, "
+            f"{result['skipped']} skipped, {result['invalid']} invalid, "
+            f"{result['rate']} users/s"
+        )
@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.users.partitions import (
+    PartitioningError,
+    convert_to_partitioned,
+    create_partitions,
+    drop_expired_partitions,
+    is_partitioned,
+    list_partitions
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Manage daily partitions of the tokens table '
+        '(PostgreSQL, TOKEN_PARTITIONING mode)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='Convert the tokens table into a partitioned table'
+        )
+        parser.add_argument(
+            '--days-ahead',
+            type=int,
+            default=getattr(settings, 'TOKEN_PARTITION_DAYS_AHEAD', 7),
+            help='Create partitions for this many days ahead'
+        )
+        parser.add_argument(
+            '--drop-expired',
+            action='store_true',
+            help='Drop partitions whose tokens have all expired'
+        )
+        parser.add_argument(
+            '--grace-days',
+            type=int,
+            default=getattr(settings, 'TOKEN_PARTITION_GRACE_DAYS', 1),
+            help='Keep expired partitions for this many days'
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='List existing partitions'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            if options['convert']:
+                self.stdout.write('Converting tokens table...')
+                convert_to_partitioned(options['days_ahead'])
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        'Converted. The old table was kept as '
+                        'tokens_unpartitioned; drop it once verified.'
+                    )
+                )
+
+            if options['list']:
+                if not is_partitioned():
+                    self.stdout.write('tokens table is not partitioned')
+                    return
+                for name, day in list_partitions():
+                    self.stdout.write(f'  {name}: {day}')
+                return
+
+            created = create_partitions(options['days_ahead'])
+            for name in created:
+                self.stdout.write(
+                    self.style.SUCCESS(f'  Created partition: {name}')
+                )
+
+            if options['drop_expired']:
+                dropped = drop_expired_partitions(options['grace_days'])
+                for name in dropped:
+                    self.stdout.write(
+                        self.style.SUCCESS(f'  Dropped partition: {name}')
+                    )
+        except PartitioningError as exc:
+            raise CommandError(str(exc))
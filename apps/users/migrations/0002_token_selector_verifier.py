@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="token",
+            name="tokens_token_e5d091_idx",
+        ),
+        migrations.AddField(
+            model_name="token",
+            name="selector",
+            field=models.CharField(
+                editable=False,
+                max_length=12,
+                null=True,
+                unique=True,
+                verbose_name="Selector",
+            ),
+        ),
+        migrations.AddField(
+            model_name="token",
+            name="verifier_hash",
+            field=models.BinaryField(
+                max_length=32, null=True, verbose_name="Verifier hash"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="token",
+            name="token",
+            field=models.CharField(
+                blank=True,
+                max_length=64,
+                null=True,
+                unique=True,
+                verbose_name="Token (legacy)",
+            ),
+        ),
+    ]
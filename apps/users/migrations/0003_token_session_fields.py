@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0002_token_selector_verifier"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="token",
+            name="fingerprint",
+            field=models.CharField(
+                blank=True, default="", max_length=64, verbose_name="Client fingerprint"
+            ),
+        ),
+        migrations.AddField(
+            model_name="token",
+            name="user_agent",
+            field=models.CharField(
+                blank=True, default="", max_length=255, verbose_name="User agent"
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0003_token_session_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="token",
+            name="last_used_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Last used at"
+            ),
+        ),
+    ]
@@ -1,8 +1,16 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
 from django.utils import timezone
+import hashlib
+import hmac
 import secrets
 
+from .access_tokens import revoke_refresh_token, revoke_refresh_tokens
+from .cache import token_cache
+from .hashing import password_hashing
+from .token_filter import token_filter
+
 
 class CustomUserManager(BaseUserManager):
     """Custom user manager for CustomUser model."""
@@ -13,7 +21,9 @@ class CustomUserManager(BaseUserManager):
             raise ValueError('The Email field must be set')
         email = self.normalize_email(email)
         user = self.model(email=email, **extra_fields)
-        user.set_password(password)
+        # Hash in the bounded pool; same fields as set_password() sets
+        user.password = password_hashing.make_password(password)
+        user._password = password
         user.save(using=self._db)
         return user
 
@@ -118,7 +128,19 @@ class UserProfile(models.Model):
 
 
 class Token(models.Model):
-    """Custom token model for authentication."""
+    """
+    Custom token model for authentication.
+
+    Tokens are issued as ``<selector>.<verifier>``: the short selector is
+    looked up through a narrow unique index and only the SHA-256 digest of
+    the verifier is stored, so the table never holds usable secrets.
+    Tokens of the old format are stored in plain text in ``token`` and are
+    accepted while ``TOKEN_LEGACY_LOOKUP`` is enabled.
+    """
+
+    SELECTOR_BYTES = 9
+    SELECTOR_LENGTH = 12
+    SEPARATOR = '.'
 
     user = models.ForeignKey(
         CustomUser,
@@ -129,14 +151,45 @@ class Token(models.Model):
     token = models.CharField(
         max_length=64,
         unique=True,
-        db_index=True,
-        verbose_name='Token'
+        null=True,
+        blank=True,
+        verbose_name='Token (legacy)'
+    )
+    selector = models.CharField(
+        max_length=SELECTOR_LENGTH,
+        unique=True,
+        null=True,
+        editable=False,
+        verbose_name='Selector'
+    )
+    verifier_hash = models.BinaryField(
+        max_length=32,
+        null=True,
+        editable=False,
+        verbose_name='Verifier hash'
+    )
+    fingerprint = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        verbose_name='Client fingerprint'
+    )
+    user_agent = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        verbose_name='User agent'
     )
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Created at'
     )
     expires_at = models.DateTimeField(verbose_name='Expires at')
+    last_used_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Last used at'
+    )
     is_active = models.BooleanField(default=True, verbose_name='Active')
 
     class Meta:
@@ -144,34 +197,147 @@ class Token(models.Model):
         verbose_name_plural = 'Tokens'
         db_table = 'tokens'
         indexes = [
-            models.Index(fields=['token', 'is_active']),
             models.Index(fields=['user', 'is_active']),
         ]
 
     def __str__(self):
         return f"Token for {self.user.email}"
 
+    @property
+    def identifier(self):
+        """Selector for new tokens, the full token for legacy ones."""
+        return self.selector or self.token
+
     @classmethod
     def generate_token(cls):
-        """Generate a secure random token."""
+        """Generate a secure random token in the legacy format."""
         return secrets.token_urlsafe(48)
 
     @classmethod
-    def create_token(cls, user, expiration_hours=24):
-        """Create a new token for a user."""
+    def generate_selector(cls):
+        """Generate a fixed-width random selector."""
+        return secrets.token_urlsafe(cls.SELECTOR_BYTES)
+
+    @staticmethod
+    def hash_verifier(verifier):
+        """Return the SHA-256 digest stored for a verifier."""
+        return hashlib.sha256(verifier.encode()).digest()
+
+    @classmethod
+    def split_token(cls, token_string):
+        """
+        Split a token string into (identifier, verifier).
+
+        Legacy tokens have no verifier: the whole string is the identifier.
+        """
+        selector, separator, verifier = token_string.partition(cls.SEPARATOR)
+        if separator and verifier and len(selector) == cls.SELECTOR_LENGTH:
+            return selector, verifier
+        return token_string, None
+
+    @classmethod
+    def verifier_matches(cls, verifier_hash, verifier):
+        """Compare a verifier with a stored digest in constant time."""
+        return hmac.compare_digest(
+            bytes(verifier_hash),
+            cls.hash_verifier(verifier)
+        )
+
+    @classmethod
+    def find(cls, token_string, queryset=None, **filters):
+        """
+        Find a token by the string presented by a client.
+
+        Raises Token.DoesNotExist when there is no such token or the
+        verifier does not match.
+        """
+        if queryset is None:
+            queryset = cls.objects.all()
+        identifier, verifier = cls.split_token(token_string)
+        if verifier is None:
+            if not getattr(settings, 'TOKEN_LEGACY_LOOKUP', True):
+                raise cls.DoesNotExist
+            return queryset.get(token=identifier, **filters)
+
+        token = queryset.get(selector=identifier, **filters)
+        if not cls.verifier_matches(token.verifier_hash, verifier):
+            raise cls.DoesNotExist
+        return token
+
+    @classmethod
+    def create_token(cls, user, expiration_hours=24, fingerprint='',
+                     user_agent=''):
+        """
+        Create a new token for a user.
+
+        The plain token string is available only on the returned instance
+        as ``plaintext``.
+        """
         from django.utils import timezone
         from datetime import timedelta
 
-        token_string = cls.generate_token()
+        selector = cls.generate_selector()
+        verifier = secrets.token_urlsafe(32)
         expires_at = timezone.now() + timedelta(hours=expiration_hours)
 
         token = cls.objects.create(
             user=user,
-            token=token_string,
+            selector=selector,
+            verifier_hash=cls.hash_verifier(verifier),
+            fingerprint=fingerprint,
+            user_agent=user_agent[:255],
             expires_at=expires_at
         )
+        token.plaintext = f'{selector}{cls.SEPARATOR}{verifier}'
+        token_filter.add(selector)
         return token
 
+    def reissue(self, expiration_hours=24):
+        """
+        Reuse this token for a new login of the same client.
+
+        The verifier is replaced, the expiry extended and created_at moved
+        to now in one UPDATE, so the reused token counts as the newest
+        session; the previous token string stops working. Legacy tokens
+        keep their string, which is the only way to hand them out again.
+        """
+        from django.utils import timezone
+        from datetime import timedelta
+
+        now = timezone.now()
+        self.created_at = now
+        self.expires_at = now + timedelta(hours=expiration_hours)
+        update = {'created_at': now, 'expires_at': self.expires_at}
+        if self.selector:
+            verifier = secrets.token_urlsafe(32)
+            self.verifier_hash = self.hash_verifier(verifier)
+            update['verifier_hash'] = self.verifier_hash
+            self.plaintext = f'{self.selector}{self.SEPARATOR}{verifier}'
+        else:
+            self.plaintext = self.token
+        Token.objects.filter(pk=self.pk).update(**update)
+        token_cache.invalidate(self.identifier)
+        return self
+
+    @classmethod
+    def invalidate_many(cls, queryset):
+        """Invalidate all active tokens of a queryset in bulk."""
+        tokens = list(
+            queryset.filter(is_active=True).values_list(
+                'pk', 'selector', 'token'
+            )
+        )
+        if not tokens:
+            return 0
+        ids = [pk for pk, _, _ in tokens]
+        count = cls.objects.filter(pk__in=ids).update(is_active=False)
+        identifiers = [selector or token for _, selector, token in tokens]
+        token_cache.invalidate_many(identifiers)
+        for identifier in identifiers:
+            token_filter.discard(identifier)
+        revoke_refresh_tokens(ids)
+        return count
+
     def is_expired(self):
         """Проверка истечения токена."""
         from django.utils import timezone
@@ -180,4 +346,9 @@ class Token(models.Model):
     def invalidate(self):
         """Инвалидация токена."""
         self.is_active = False
-        self.save()
+        # Обновление по pk: экземпляр может быть восстановлен из кэша,
+        # а строка — уже удалена очисткой токенов
+        Token.objects.filter(pk=self.pk).update(is_active=False)
+        token_cache.invalidate(self.identifier)
+        token_filter.discard(self.identifier)
+        revoke_refresh_token(self.pk)
@@ -0,0 +1,202 @@
+"""
+Секционирование таблицы tokens по expires_at (только PostgreSQL).
+
+В этом режиме таблица tokens декларативно секционирована по диапазонам
+expires_at, по секции на сутки. Истекшие токены удаляются целыми
+секциями (DROP TABLE вместо DELETE), что не создает нагрузки на
+VACUUM. Первичный ключ и уникальные индексы секционированной таблицы
+обязаны включать ключ секционирования, поэтому они становятся
+составными: (id, expires_at), (selector, expires_at), (token, expires_at).
+"""
+import re
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Token
+
+
+TABLE = Token._meta.db_table
+USERS_TABLE = Token._meta.get_field('user').related_model._meta.db_table
+OLD_TABLE = f'{TABLE}_unpartitioned'
+DEFAULT_PARTITION = f'{TABLE}_default'
+PARTITION_PREFIX = f'{TABLE}_p'
+PARTITION_RE = re.compile(rf'^{PARTITION_PREFIX}(\d{{8}})$')
+
+
+class PartitioningError(Exception):
+    """Секционирование недоступно или таблица в неожиданном состоянии."""
+
+
+def _check_vendor():
+    if connection.vendor != 'postgresql':
+        raise PartitioningError(
+            'Секционирование таблицы tokens поддерживается только '
+            'в PostgreSQL'
+        )
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(
+        datetime.combine(day, time.min),
+        dt_timezone.utc
+    )
+    return start, start + timedelta(days=1)
+
+
+def partition_name(day):
+    return f'{PARTITION_PREFIX}{day:%Y%m%d}'
+
+
+def is_partitioned():
+    """Проверить, секционирована ли таблица tokens."""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relkind FROM pg_class c "
+            "WHERE c.oid = to_regclass(%s)",
+            [TABLE]
+        )
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def list_partitions():
+    """Вернуть список (имя, день) суточных секций."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s) "
+            "ORDER BY child.relname",
+            [TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        match = PARTITION_RE.match(name)
+        if match:
+            day = datetime.strptime(match.group(1), '%Y%m%d').date()
+            partitions.append((name, day))
+    return partitions
+
+
+def create_partition(day):
+    """Создать секцию для суток `day`, если ее еще нет."""
+    start, end = _day_bounds(day)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {_quote(partition_name(day))} "
+            f"PARTITION OF {_quote(TABLE)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [start, end]
+        )
+
+
+def create_partitions(days_ahead, start=None):
+    """Создать секции с `start` (по умолчанию сегодня) на days_ahead дней."""
+    _check_vendor()
+    if not is_partitioned():
+        raise PartitioningError('Таблица tokens не секционирована')
+    start = start or timezone.now().date()
+    created = []
+    existing = {day for _, day in list_partitions()}
+    for offset in range(days_ahead + 1):
+        day = start + timedelta(days=offset)
+        if day not in existing:
+            create_partition(day)
+            created.append(partition_name(day))
+    return created
+
+
+def drop_expired_partitions(grace_days=0):
+    """
+    Удалить секции, все токены которых истекли более grace_days назад.
+
+    Секция сначала отсоединяется, затем удаляется целиком.
+    """
+    _check_vendor()
+    if not is_partitioned():
+        raise PartitioningError('Таблица tokens не секционирована')
+    cutoff = timezone.now().date() - timedelta(days=grace_days)
+    dropped = []
+    for name, day in list_partitions():
+        if day + timedelta(days=1) > cutoff:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"ALTER TABLE {_quote(TABLE)} "
+                f"DETACH PARTITION {_quote(name)}"
+            )
+            cursor.execute(f"DROP TABLE {_quote(name)}")
+        dropped.append(name)
+    return dropped
+
+
+def convert_to_partitioned(days_ahead):
+    """
+    Перевести таблицу tokens в секционированный режим.
+
+    Старая таблица переименовывается в tokens_unpartitioned и остается
+    для отката; ее нужно удалить вручную после проверки. Данные
+    копируются в одной транзакции, поэтому операцию лучше выполнять
+    после cleanup_tokens, в период низкой нагрузки.
+    """
+    _check_vendor()
+    if is_partitioned():
+        raise PartitioningError('Таблица tokens уже секционирована')
+
+    table, old = _quote(TABLE), _quote(OLD_TABLE)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {old}")
+        cursor.execute(
+            f"CREATE TABLE {table} (LIKE {old} "
+            f"INCLUDING DEFAULTS INCLUDING IDENTITY) "
+            f"PARTITION BY RANGE (expires_at)"
+        )
+        cursor.execute(
+            f"ALTER TABLE {table} ADD PRIMARY KEY (id, expires_at)"
+        )
+        cursor.execute(
+            f"CREATE UNIQUE INDEX {_quote(TABLE + '_selector_uniq')} "
+            f"ON {table} (selector, expires_at)"
+        )
+        cursor.execute(
+            f"CREATE UNIQUE INDEX {_quote(TABLE + '_token_uniq')} "
+            f"ON {table} (token, expires_at)"
+        )
+        cursor.execute(
+            f"CREATE INDEX {_quote(TABLE + '_user_active_idx')} "
+            f"ON {table} (user_id, is_active)"
+        )
+        cursor.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT "
+            f"{_quote(TABLE + '_user_id_fk')} FOREIGN KEY (user_id) "
+            f"REFERENCES {_quote(USERS_TABLE)} (id) "
+            f"DEFERRABLE INITIALLY DEFERRED"
+        )
+        cursor.execute(
+            f"CREATE TABLE {_quote(DEFAULT_PARTITION)} "
+            f"PARTITION OF {table} DEFAULT"
+        )
+
+        cursor.execute(f"SELECT min(expires_at) FROM {old}")
+        oldest = cursor.fetchone()[0]
+        today = timezone.now().date()
+        first_day = min(oldest.date(), today) if oldest else today
+        for offset in range((today - first_day).days + days_ahead + 1):
+            create_partition(first_day + timedelta(days=offset))
+
+        cursor.execute(f"INSERT INTO {table} SELECT * FROM {old}")
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+            f"COALESCE((SELECT max(id) FROM {table}), 0) + 1, false)",
+            [TABLE]
+        )
@@ -1,6 +1,8 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
-from .models import CustomUser, UserProfile
+from .importer import FORMATS, detect_format
+from .models import CustomUser, Token, UserProfile
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
@@ -139,3 +141,38 @@ class LoginSerializer(serializers.Serializer):
 
     email = serializers.EmailField(required=True)
     password = serializers.CharField(write_only=True, required=True)
+
+
+class SessionSerializer(serializers.ModelSerializer):
+    """Сериализатор активной сессии (токена) пользователя."""
+
+    is_current = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Token
+        fields = (
+            'id', 'user_agent', 'created_at', 'expires_at', 'last_used_at',
+            'is_current'
+        )
+        read_only_fields = fields
+
+    def get_is_current(self, obj):
+        return obj.pk == self.context.get('current_token_id')
+
+
+class UserImportSerializer(serializers.Serializer):
+    """Файл CSV или JSONL для массового импорта пользователей."""
+
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=FORMATS, required=False)
+    chunk_size = serializers.IntegerField(
+        min_value=1,
+        max_value=100000,
+        default=getattr(settings, 'USER_IMPORT_CHUNK_SIZE', 1000)
+    )
+
+    def validate(self, attrs):
+        """Формат по расширению файла, если он не указан явно."""
+        if not attrs.get('format'):
+            attrs['format'] = detect_format(attrs['file'].name)
+        return attrs
@@ -0,0 +1,94 @@
+"""
+Политики сессий при входе.
+
+Повторный вход того же устройства (по device_id, переданному клиентом)
+переиспользует его активный токен, а число активных токенов
+пользователя ограничено: при превышении лимита самые старые токены
+инвалидируются. Так таблица tokens не растет от клиентов, которые
+выполняют вход при каждом запуске.
+"""
+import hashlib
+
+from django.conf import settings
+from django.utils import timezone
+from loguru import logger
+
+from .models import Token
+
+
+def device_id(request):
+    """Идентификатор устройства из тела запроса или пустая строка."""
+    if not hasattr(request, 'data'):
+        return ''
+    return str(request.data.get('device_id') or '')
+
+
+def client_fingerprint(request):
+    """
+    Отпечаток клиента: User-Agent и необязательный device_id из тела
+    запроса.
+    """
+    user_agent = request.META.get('HTTP_USER_AGENT', '')
+    return hashlib.sha256(
+        f'{device_id(request)}\n{user_agent}'.encode()
+    ).hexdigest()
+
+
+def issue_login_token(user, request, expiration_hours):
+    """
+    Выдать токен при входе с учетом политик сессий.
+
+    Токен переиспользуется, только если клиент передал device_id: по
+    одному User-Agent разные устройства с одинаковым браузером не
+    различить, и переиспользование завершило бы сессию другого
+    устройства. Возвращает токен с заполненным атрибутом plaintext.
+    """
+    fingerprint = client_fingerprint(request)
+    reuse = getattr(settings, 'TOKEN_REUSE_FOR_SAME_CLIENT', True)
+    if reuse and device_id(request):
+        token = Token.objects.filter(
+            user=user,
+            is_active=True,
+            fingerprint=fingerprint,
+            expires_at__gt=timezone.now()
+        ).order_by('-created_at').first()
+        if token is not None:
+            logger.debug(f"Повторное использование токена для: {user.email}")
+            return token.reissue(expiration_hours)
+
+    token = Token.create_token(
+        user,
+        expiration_hours,
+        fingerprint=fingerprint,
+        user_agent=request.META.get('HTTP_USER_AGENT', '')
+    )
+    enforce_session_limit(user)
+    return token
+
+
+def enforce_session_limit(user):
+    """Инвалидировать самые старые токены сверх лимита активных сессий."""
+    limit = getattr(settings, 'TOKEN_MAX_ACTIVE_PER_USER', 0)
+    if limit <= 0:
+        return 0
+    excess = Token.objects.filter(
+        user=user,
+        is_active=True
+    ).order_by('-created_at', '-id').values_list('pk', flat=True)[limit:]
+    excess_ids = list(excess)
+    if not excess_ids:
+        return 0
+    count = Token.invalidate_many(Token.objects.filter(pk__in=excess_ids))
+    logger.info(
+        f"Превышен лимит сессий для {user.email}: "
+        f"инвалидировано токенов: {count}"
+    )
+    return count
+
+
+def current_token_id(request):
+    """id токена из таблицы tokens, которым аутентифицирован запрос."""
+    auth = request.auth
+    if isinstance(auth, Token):
+        return auth.pk
+    return getattr(auth, 'refresh_token_id', None)
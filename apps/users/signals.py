@@ -0,0 +1,62 @@
+"""
+Сигналы для сброса кэшированных данных аутентификации.
+
+Снимки токенов в кэше содержат флаги пользователя. Изменение этих флагов
+или email должно действовать со следующего запроса на всех воркерах,
+поэтому снимки токенов пользователя удаляются из кэша, а выпущенные
+access-токены отзываются.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from .access_tokens import revoke_user
+from .cache import token_cache
+from .models import CustomUser, Token
+
+
+# Поля пользователя, которые хранятся в снимках токенов
+AUTH_FIELDS = ('email', 'is_active', 'is_staff', 'is_superuser')
+
+
+@receiver(pre_save, sender=CustomUser)
+def remember_auth_fields(sender, instance, update_fields=None, **kwargs):
+    """Запомнить значения полей до сохранения."""
+    if instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(
+        AUTH_FIELDS
+    ):
+        return
+    instance._previous_auth_fields = sender.objects.filter(
+        pk=instance.pk
+    ).values(*AUTH_FIELDS).first()
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """
+    Удалить снимки токенов пользователя и отозвать его access-токены,
+    если поля изменились.
+    """
+    previous = getattr(instance, '_previous_auth_fields', None)
+    instance._previous_auth_fields = None
+    if created or previous is None:
+        return
+    if all(
+        previous[field] == getattr(instance, field) for field in AUTH_FIELDS
+    ):
+        return
+    tokens = list(Token.objects.filter(
+        user_id=instance.pk,
+        is_active=True
+    ).values_list('id', 'selector', 'token'))
+    identifiers = [selector or token for _, selector, token in tokens]
+    token_ids = [token_id for token_id, _, _ in tokens]
+    user_id = instance.pk
+
+    def invalidate():
+        token_cache.invalidate_user(user_id, identifiers)
+        revoke_user(user_id, token_ids)
+
+    transaction.on_commit(invalidate)
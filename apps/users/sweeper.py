@@ -0,0 +1,170 @@
+"""
+Очистка истекших и неактивных токенов.
+
+Удаление идет пакетами по диапазонам первичного ключа с паузами между
+ними, чтобы не держать долгих блокировок и не создавать всплесков WAL
+на больших таблицах.
+"""
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+from loguru import logger
+
+from .models import Token
+
+
+# Ключ advisory-блокировки очистки в PostgreSQL
+SWEEP_LOCK_ID = 0x746f6b656e73
+
+
+def sweepable_tokens(now=None):
+    """Токены, которые можно удалить: истекшие или неактивные."""
+    now = now or timezone.now()
+    return Token.objects.filter(Q(expires_at__lte=now) | Q(is_active=False))
+
+
+def token_statistics(now=None):
+    """Количество активных, истекших и неактивных токенов."""
+    now = now or timezone.now()
+    bounds = Token.objects.aggregate(min_id=Min('id'), max_id=Max('id'))
+    return {
+        'total': Token.objects.count(),
+        'active': Token.objects.filter(
+            is_active=True,
+            expires_at__gt=now
+        ).count(),
+        'expired': Token.objects.filter(
+            is_active=True,
+            expires_at__lte=now
+        ).count(),
+        'inactive': Token.objects.filter(is_active=False).count(),
+        'min_id': bounds['min_id'],
+        'max_id': bounds['max_id'],
+    }
+
+
+def sweep_tokens(batch_size=5000, pause=0.1, dry_run=False, progress=None):
+    """
+    Удалить истекшие и неактивные токены пакетами.
+
+    Таблица обходится диапазонами id по `batch_size`, каждый диапазон
+    удаляется отдельным коротким запросом, между запросами выдерживается
+    пауза `pause` секунд. При `dry_run` токены только подсчитываются.
+    `progress(low, high, count)` вызывается после каждого пакета.
+    Возвращает словарь со статистикой.
+    """
+    now = timezone.now()
+    bounds = Token.objects.aggregate(min_id=Min('id'), max_id=Max('id'))
+    stats = {'batches': 0, 'deleted': 0, 'dry_run': dry_run}
+    if bounds['min_id'] is None:
+        return stats
+
+    low = bounds['min_id']
+    while low <= bounds['max_id']:
+        high = low + batch_size
+        batch = sweepable_tokens(now).filter(id__gte=low, id__lt=high)
+        if dry_run:
+            count = batch.count()
+        else:
+            count, _ = batch.delete()
+        stats['batches'] += 1
+        stats['deleted'] += count
+        if progress is not None:
+            progress(low, high, count)
+        low = high
+        if count and pause:
+            time.sleep(pause)
+    return stats
+
+
+@contextmanager
+def sweep_lock():
+    """
+    Блокировка очистки на уровне БД.
+
+    В PostgreSQL берется сессионная advisory-блокировка, поэтому
+    одновременно запущенные очистки (cron на нескольких узлах,
+    перекрывающиеся запуски) не работают параллельно. Выдает True, если
+    блокировка получена. В остальных СУБД блокировки нет.
+    """
+    if connection.vendor != 'postgresql':
+        yield True
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_lock(%s)', [SWEEP_LOCK_ID])
+        acquired = cursor.fetchone()[0]
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT pg_advisory_unlock(%s)',
+                    [SWEEP_LOCK_ID]
+                )
+
+
+class TokenSweeper:
+    """
+    Периодическая очистка токенов отдельным процессом
+    (`manage.py cleanup_tokens --loop`).
+
+    Каждый проход выполняется под блокировкой sweep_lock(), так что
+    при нескольких запущенных процессах очистку выполняет только один.
+    """
+
+    def __init__(self, interval, batch_size, pause):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+
+    def run_forever(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Ошибка при очистке токенов")
+            finally:
+                connection.close()
+            time.sleep(self.interval)
+
+    def run_once(self, progress=None):
+        """
+        Выполнить один проход очистки.
+
+        Возвращает статистику sweep_tokens() или None, если очистку
+        сейчас выполняет другой процесс.
+        """
+        with sweep_lock() as acquired:
+            if not acquired:
+                logger.info("Очистка токенов уже выполняется")
+                return None
+            if getattr(settings, 'TOKEN_PARTITIONING', False):
+                self._maintain_partitions()
+            stats = sweep_tokens(
+                batch_size=self.batch_size,
+                pause=self.pause,
+                progress=progress
+            )
+        logger.info(
+            f"Очистка токенов: удалено {stats['deleted']} "
+            f"за {stats['batches']} пакетов"
+        )
+        return stats
+
+    def _maintain_partitions(self):
+        """Создать будущие секции и удалить истекшие."""
+        from .partitions import create_partitions, drop_expired_partitions
+
+        create_partitions(
+            getattr(settings, 'TOKEN_PARTITION_DAYS_AHEAD', 7)
+        )
+        dropped = drop_expired_partitions(
+            getattr(settings, 'TOKEN_PARTITION_GRACE_DAYS', 1)
+        )
+        if dropped:
+            logger.info(f"Удалены секции токенов: {', '.join(dropped)}")
@@ -0,0 +1,189 @@
+"""
+Отложенная запись активности токенов.
+
+Аутентификация не пишет в БД: отметки об использовании токена
+накапливаются в памяти процесса, объединяются по токену и периодически
+записываются одним UPDATE. Скользящее продление срока действия
+выполняется тем же запросом и только когда до истечения токена остается
+меньше порога, поэтому большинство запросов остаются только читающими.
+"""
+import atexit
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.utils import timezone
+from loguru import logger
+
+from config.cache import TTLCache
+
+from .cache import token_cache
+
+
+class TokenActivityBuffer:
+    """
+    Буфер отметок об использовании токенов.
+
+    Для каждого токена хранится только последняя отметка, поэтому размер
+    буфера ограничен числом активных токенов. Запись выполняется
+    фоновым потоком раз в `flush_interval` секунд или раньше, если в
+    буфере накопилось `max_pending` токенов. last_used_at обновляется
+    не чаще, чем раз в `staleness` секунд. Запись делается по принципу
+    best effort: при ошибке отметки теряются, а продление повторится при
+    следующем запросе с этим токеном.
+    """
+
+    # Число токенов в одном UPDATE
+    CHUNK_SIZE = 500
+
+    def __init__(self, enabled, flush_interval, staleness, max_pending,
+                 sliding, lifetime_hours, threshold_hours):
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.staleness = timedelta(seconds=staleness)
+        self.max_pending = max_pending
+        self.sliding = sliding
+        self.lifetime = timedelta(hours=lifetime_hours)
+        self.threshold = timedelta(hours=threshold_hours)
+        # pk -> (идентификатор, last_used_at, новый expires_at или None)
+        self._pending = {}
+        # Токены, отмеченные этим процессом за последние `staleness` секунд;
+        # снимок в кэше токенов хранит last_used_at на момент загрузки
+        self._recent = TTLCache(max_size=max_pending, ttl=staleness)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.touched = 0
+        self.flushes = 0
+        self.written = 0
+        self.extended = 0
+        self.errors = 0
+
+    def touch(self, token):
+        """Отметить использование токена при аутентификации."""
+        if not self.enabled:
+            return
+        now = timezone.now()
+        expires_at = None
+        if self.sliding and token.expires_at - now < self.threshold:
+            expires_at = now + self.lifetime
+        elif self._recent.get(token.pk) or (
+            token.last_used_at is not None
+            and now - token.last_used_at < self.staleness
+        ):
+            return
+
+        with self._lock:
+            self.touched += 1
+            pending = self._pending.get(token.pk)
+            if expires_at is None and pending is not None:
+                expires_at = pending[2]
+            self._pending[token.pk] = (token.identifier, now, expires_at)
+            size = len(self._pending)
+        self._recent.set(token.pk, True)
+        self._start()
+        if size >= self.max_pending:
+            self._wake.set()
+
+    def flush(self):
+        """Записать накопленные отметки. Возвращает число токенов."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        from .models import Token
+
+        items = list(pending.items())
+        extended = []
+        try:
+            for start in range(0, len(items), self.CHUNK_SIZE):
+                chunk = items[start:start + self.CHUNK_SIZE]
+                update = {
+                    'last_used_at': Case(
+                        *[
+                            When(pk=pk, then=Value(last_used_at))
+                            for pk, (_, last_used_at, _) in chunk
+                        ],
+                        default=F('last_used_at'),
+                        output_field=DateTimeField()
+                    )
+                }
+                extensions = [
+                    When(pk=pk, then=Value(expires_at))
+                    for pk, (_, _, expires_at) in chunk
+                    if expires_at is not None
+                ]
+                if extensions:
+                    update['expires_at'] = Case(
+                        *extensions,
+                        default=F('expires_at'),
+                        output_field=DateTimeField()
+                    )
+                Token.objects.filter(
+                    pk__in=[pk for pk, _ in chunk]
+                ).update(**update)
+                self.written += len(chunk)
+                self.extended += len(extensions)
+                extended.extend(
+                    identifier
+                    for _, (identifier, _, expires_at) in chunk
+                    if expires_at is not None
+                )
+        except Exception:
+            self.errors += 1
+            logger.exception("Не удалось записать активность токенов")
+        finally:
+            self.flushes += 1
+            # Снимки продленных токенов содержат старый срок действия
+            token_cache.invalidate_many(extended)
+        return len(items)
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run,
+                name='token-activity-flush',
+                daemon=True
+            )
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            finally:
+                connection.close()
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'sliding': self.sliding,
+            'pending': len(self._pending),
+            'touched': self.touched,
+            'flushes': self.flushes,
+            'written': self.written,
+            'extended': self.extended,
+            'errors': self.errors,
+            'flush_interval': self.flush_interval,
+        }
+
+
+token_activity = TokenActivityBuffer(
+    enabled=getattr(settings, 'TOKEN_ACTIVITY_TRACKING', True),
+    flush_interval=getattr(settings, 'TOKEN_ACTIVITY_FLUSH_INTERVAL', 10),
+    staleness=getattr(settings, 'TOKEN_ACTIVITY_STALENESS', 300),
+    max_pending=getattr(settings, 'TOKEN_ACTIVITY_MAX_PENDING', 10000),
+    sliding=getattr(settings, 'TOKEN_SLIDING_EXPIRATION', True),
+    lifetime_hours=getattr(settings, 'TOKEN_EXPIRATION_HOURS', 24),
+    threshold_hours=getattr(settings, 'TOKEN_SLIDING_THRESHOLD_HOURS', 6),
+)
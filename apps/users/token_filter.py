@@ -0,0 +1,294 @@
+"""
+Фильтр Блума выданных токенов.
+
+Позволяет отклонить заведомо неизвестный токен без обращения к
+PostgreSQL. Фильтр строится по активным токенам в фоновом потоке при
+первом запросе воркера и периодически перестраивается; новые токены
+добавляются в него сразу. Токены, выданные другими воркерами после
+последней перестройки, подтягиваются при промахе инкрементальной
+синхронизацией по первичному ключу. Отметка в общем кэше лишь ускоряет
+распознавание свежих токенов: ее вытеснение не приводит к отказу.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from loguru import logger
+
+from config.cache import TwoTierCache
+
+
+# Время жизни отметки о выданном токене (в секундах)
+ISSUED_MARK_TTL = 60
+# Запас по id при синхронизации: транзакции фиксируются не в порядке
+# выдачи id, поэтому последние строки перечитываются
+SYNC_OVERLAP = 1000
+
+
+class BloomFilter:
+    """Фильтр Блума на bytearray с двойным хешированием."""
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(
+            8,
+            int(math.ceil(
+                -capacity * math.log(error_rate) / (math.log(2) ** 2)
+            ))
+        )
+        self.hash_count = max(
+            1, int(round(self.size / capacity * math.log(2)))
+        )
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+    @property
+    def memory_bytes(self):
+        return len(self.bits)
+
+    def false_positive_rate(self):
+        """Оценка вероятности ложноположительного ответа."""
+        return (
+            1 - math.exp(-self.hash_count * self.count / self.size)
+        ) ** self.hash_count
+
+
+class TokenFilter:
+    """Фильтр активных токенов процесса."""
+
+    def __init__(
+        self,
+        enabled,
+        capacity,
+        error_rate,
+        rebuild_interval,
+        sync_interval=1.0
+    ):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self.sync_interval = sync_interval
+        self._filter = None
+        self._built_at = None
+        self._rebuilding = False
+        self._max_id = 0
+        self._synced_at = None
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        # Отметки о недавно выданных токенах для остальных воркеров
+        self._issued = TwoTierCache(
+            'issued',
+            ttl=ISSUED_MARK_TTL,
+            local_ttl=getattr(settings, 'TOKEN_CACHE_LOCAL_TTL', 5),
+            local_max_size=getattr(settings, 'TOKEN_CACHE_MAX_SIZE', 10000),
+            enabled=enabled,
+            cache_missing=True,
+        )
+        self.checks = 0
+        self.rejected = 0
+        self.discarded = 0
+        self.syncs = 0
+
+    @staticmethod
+    def make_key(identifier):
+        return hashlib.sha256(identifier.encode()).hexdigest()
+
+    def might_exist(self, identifier):
+        """
+        Вернуть False, только если токен с таким идентификатором
+        (селектором или токеном старого формата) точно не выдавался.
+
+        Пока фильтр не построен, все токены считаются возможными. Перед
+        отказом фильтр дочитывает токены, выданные после последней
+        синхронизации, не чаще раза в sync_interval секунд.
+        """
+        if not self.enabled:
+            return True
+        self._schedule_rebuild()
+        current = self._filter
+        if current is None:
+            return True
+        self.checks += 1
+        key = self.make_key(identifier)
+        if key in current or self._issued.get(key):
+            return True
+        if self._sync() and key in self._filter:
+            return True
+        self.rejected += 1
+        return False
+
+    def add(self, identifier):
+        """Добавить только что выданный токен."""
+        if not self.enabled:
+            return
+        key = self.make_key(identifier)
+        current = self._filter
+        if current is not None:
+            current.add(key)
+        self._issued.set(key, True)
+
+    def discard(self, identifier):
+        """
+        Учесть инвалидацию токена.
+
+        Из фильтра Блума нельзя удалять, поэтому токен остается в нем до
+        следующей перестройки; БД по-прежнему отклонит его.
+        """
+        if self.enabled:
+            self.discarded += 1
+
+    def rebuild(self):
+        """Перестроить фильтр по активным неистекшим токенам."""
+        from .models import Token
+
+        started = time.monotonic()
+        tokens = Token.objects.filter(
+            is_active=True,
+            expires_at__gt=timezone.now()
+        ).values_list('id', 'selector', 'token')
+        count = tokens.count()
+        bloom = BloomFilter(
+            max(self.capacity, count * 2),
+            self.error_rate
+        )
+        max_id = 0
+        for token_id, selector, token_string in tokens.iterator(
+            chunk_size=10000
+        ):
+            bloom.add(self.make_key(selector or token_string))
+            max_id = max(max_id, token_id)
+        with self._sync_lock:
+            with self._lock:
+                self._filter = bloom
+                self._built_at = time.monotonic()
+                self.discarded = 0
+            self._max_id = max_id
+            self._synced_at = started
+        logger.info(
+            f"Фильтр токенов перестроен: {bloom.count} токенов, "
+            f"{bloom.memory_bytes} байт, "
+            f"{time.monotonic() - started:.2f} с"
+        )
+
+    def _sync(self):
+        """
+        Добавить в фильтр токены с id больше последнего прочитанного.
+
+        Запрос идет по индексу первичного ключа и обычно возвращает
+        несколько строк. Вернуть True, если синхронизация выполнена.
+        """
+        from .models import Token
+
+        synced_at = self._synced_at
+        if (
+            synced_at is not None
+            and time.monotonic() - synced_at < self.sync_interval
+        ):
+            return False
+        with self._sync_lock:
+            if self._synced_at != synced_at:
+                # Пока ждали блокировку, синхронизацию выполнил другой поток
+                return True
+            started = time.monotonic()
+            tokens = Token.objects.filter(
+                id__gt=max(self._max_id - SYNC_OVERLAP, 0),
+                is_active=True,
+                expires_at__gt=timezone.now()
+            ).values_list('id', 'selector', 'token')
+            current = self._filter
+            max_id = self._max_id
+            for token_id, selector, token_string in tokens:
+                current.add(self.make_key(selector or token_string))
+                max_id = max(max_id, token_id)
+            self._max_id = max_id
+            self._synced_at = started
+            self.syncs += 1
+        return True
+
+    def _schedule_rebuild(self):
+        built_at = self._built_at
+        if (
+            built_at is not None
+            and time.monotonic() - built_at < self.rebuild_interval
+        ):
+            return
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(
+            target=self._rebuild_in_background,
+            name='token-filter-rebuild',
+            daemon=True
+        ).start()
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception("Не удалось перестроить фильтр токенов")
+        finally:
+            connection.close()
+            with self._lock:
+                self._rebuilding = False
+                if self._built_at is None:
+                    # Повторить попытку не раньше, чем через интервал
+                    self._built_at = time.monotonic()
+
+    def stats(self):
+        current = self._filter
+        stats = {
+            'enabled': self.enabled,
+            'ready': current is not None,
+            'checks': self.checks,
+            'rejected': self.rejected,
+            'discarded_since_rebuild': self.discarded,
+            'syncs': self.syncs,
+            'rebuild_interval': self.rebuild_interval,
+            'sync_interval': self.sync_interval,
+        }
+        if current is not None:
+            stats.update({
+                'count': current.count,
+                'capacity': current.capacity,
+                'bits': current.size,
+                'hash_count': current.hash_count,
+                'memory_bytes': current.memory_bytes,
+                'false_positive_rate': current.false_positive_rate(),
+                'age': time.monotonic() - self._built_at,
+            })
+        return stats
+
+
+token_filter = TokenFilter(
+    enabled=getattr(settings, 'TOKEN_FILTER_ENABLED', False),
+    capacity=getattr(settings, 'TOKEN_FILTER_CAPACITY', 1000000),
+    error_rate=getattr(settings, 'TOKEN_FILTER_ERROR_RATE', 0.001),
+    rebuild_interval=getattr(settings, 'TOKEN_FILTER_REBUILD_INTERVAL', 3600),
+    sync_interval=getattr(settings, 'TOKEN_FILTER_SYNC_INTERVAL', 1.0),
+)
@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AuthViewSet, ProfileViewSet
+from .views import AuthViewSet, ProfileViewSet, SessionViewSet
 
 router = DefaultRouter()
 router.register(r'', AuthViewSet, basename='auth')
 router.register(r'profile', ProfileViewSet, basename='profile')
+router.register(r'sessions', SessionViewSet, basename='session')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,15 +1,27 @@
+import io
+import json
+
 from rest_framework import status, viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.conf import settings
+from django.http import StreamingHttpResponse
 from loguru import logger
+from apps.authorization.permissions import IsAdmin
+from .access_tokens import AccessToken, issue_access_token, revoke_user
+from .cache import token_cache
+from .hashing import HashingBusy, password_hashing
+from .importer import ImportStats, UserImporter, read_records
 from .models import CustomUser, Token
 from .serializers import (
     UserRegistrationSerializer,
     UserSerializer,
     UserUpdateSerializer,
-    LoginSerializer
+    LoginSerializer,
+    SessionSerializer,
+    UserImportSerializer
 )
+from .session_policy import current_token_id, issue_login_token
 
 
 class IsAuthenticatedWithLogging(permissions.IsAuthenticated):
@@ -31,6 +43,16 @@ class IsAuthenticatedWithLogging(permissions.IsAuthenticated):
         return result
 
 
+def hashing_busy_response(exc):
+    """Ответ 503 при перегрузке пула хеширования паролей."""
+    logger.warning(f"Отказ в хешировании пароля: {exc}")
+    return Response(
+        {'error': 'Сервис перегружен, повторите попытку позже'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': '1'}
+    )
+
+
 class AuthViewSet(viewsets.ViewSet):
     """ViewSet для операций аутентификации."""
 
@@ -41,7 +63,10 @@ class AuthViewSet(viewsets.ViewSet):
         """Регистрация нового пользователя."""
         serializer = UserRegistrationSerializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
+            try:
+                user = serializer.save()
+            except HashingBusy as exc:
+                return hashing_busy_response(exc)
             logger.info(f"Новый пользователь зарегистрирован: {user.email}")
             user_serializer = UserSerializer(user)
             return Response(
@@ -87,23 +112,58 @@ class AuthViewSet(viewsets.ViewSet):
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
-        if not user.check_password(password):
+        try:
+            password_valid, must_update = password_hashing.verify_password(
+                password,
+                user.password
+            )
+        except HashingBusy as exc:
+            return hashing_busy_response(exc)
+
+        if not password_valid:
             logger.warning(f"Неверный пароль для пользователя: {email}")
             return Response(
                 {'error': 'Неверный email или пароль'},
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
+        if password_hashing.rehash_if_needed(user, password, must_update):
+            logger.info(f"Пароль перехеширован для пользователя: {email}")
+
         # Создать или получить существующий активный токен
         expiration_hours = getattr(settings, 'TOKEN_EXPIRATION_HOURS', 24)
-        token = Token.create_token(user, expiration_hours)
+        token = issue_login_token(user, request, expiration_hours)
+        access_token, access_expires_at = issue_access_token(token)
         logger.info(f"Успешный вход пользователя: {email}")
 
         user_serializer = UserSerializer(user)
         return Response({
-            'token': token.token,
+            'token': token.plaintext,
             'user': user_serializer.data,
-            'expires_at': token.expires_at
+            'expires_at': token.expires_at,
+            'access_token': access_token,
+            'access_expires_at': access_expires_at
+        }, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='refresh',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def refresh(self, request):
+        """Выпустить новый access-токен по токену из таблицы tokens."""
+        if not isinstance(request.auth, Token):
+            return Response(
+                {'error': 'Требуется заголовок Authorization: Token <token>'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        access_token, access_expires_at = issue_access_token(request.auth)
+        logger.debug(f"Выпущен access-токен для: {request.user.email}")
+        return Response({
+            'access_token': access_token,
+            'access_expires_at': access_expires_at
         }, status=status.HTTP_200_OK)
 
     @action(
@@ -114,6 +174,20 @@ class AuthViewSet(viewsets.ViewSet):
     )
     def logout(self, request):
         """Выход пользователя путем инвалидации токена."""
+        if isinstance(request.auth, AccessToken):
+            # Отзываем refresh-токен, из которого выпущен access-токен
+            token = Token.objects.filter(
+                pk=request.auth.refresh_token_id,
+                user=request.user
+            ).first()
+            if token is not None:
+                token.invalidate()
+                logger.info(f"Пользователь вышел: {request.user.email}")
+            return Response(
+                {'message': 'Выход выполнен успешно'},
+                status=status.HTTP_200_OK
+            )
+
         auth_header = request.META.get('HTTP_AUTHORIZATION', '')
 
         if auth_header:
@@ -121,10 +195,7 @@ class AuthViewSet(viewsets.ViewSet):
                 auth_type, token_string = auth_header.split(' ', 1)
                 if auth_type.lower() == 'token':
                     try:
-                        token = Token.objects.get(
-                            token=token_string,
-                            user=request.user
-                        )
+                        token = Token.find(token_string, user=request.user)
                         token.invalidate()
                         logger.info(f"Пользователь вышел: {request.user.email}")
                     except Token.DoesNotExist:
@@ -132,6 +203,10 @@ class AuthViewSet(viewsets.ViewSet):
                             f"Токен не найден при выходе для пользователя: "
                             f"{request.user.email}"
                         )
+                    finally:
+                        token_cache.invalidate(
+                            Token.split_token(token_string)[0]
+                        )
             except ValueError:
                 logger.warning("Неверный формат заголовка авторизации при выходе")
 
@@ -189,10 +264,11 @@ class ProfileViewSet(viewsets.ViewSet):
         """Мягкое удаление учетной записи пользователя."""
         user_email = request.user.email
         # Инвалидировать все токены
-        tokens_count = Token.objects.filter(
-            user=request.user,
-            is_active=True
-        ).update(is_active=False)
+        tokens_count = Token.invalidate_many(
+            Token.objects.filter(user=request.user)
+        )
+        token_cache.invalidate_user(request.user.pk)
+        revoke_user(request.user.pk)
 
         # Мягкое удаление пользователя
         request.user.is_active = False
@@ -207,3 +283,113 @@ class ProfileViewSet(viewsets.ViewSet):
             {'message': 'Аккаунт успешно удален'},
             status=status.HTTP_200_OK
         )
+
+
+class SessionViewSet(viewsets.ViewSet):
+    """ViewSet для просмотра и отзыва активных сессий пользователя."""
+
+    permission_classes = [IsAuthenticatedWithLogging]
+    lookup_value_regex = r'\d+'
+
+    def get_queryset(self):
+        from django.utils import timezone
+
+        return Token.objects.filter(
+            user=self.request.user,
+            is_active=True,
+            expires_at__gt=timezone.now()
+        ).only(
+            'id', 'user_agent', 'created_at', 'expires_at', 'last_used_at'
+        ).order_by('-created_at')
+
+    def list(self, request):
+        """Список активных сессий текущего пользователя."""
+        serializer = SessionSerializer(
+            self.get_queryset(),
+            many=True,
+            context={'current_token_id': current_token_id(request)}
+        )
+        return Response(serializer.data)
+
+    def destroy(self, request, pk=None):
+        """Завершить одну из сессий текущего пользователя."""
+        count = Token.invalidate_many(self.get_queryset().filter(pk=pk))
+        if not count:
+            return Response(
+                {'error': 'Сессия не найдена'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        logger.info(f"Сессия {pk} завершена: {request.user.email}")
+        return Response(
+            {'message': 'Сессия завершена'},
+            status=status.HTTP_200_OK
+        )
+
+
+class UserImportViewSet(viewsets.ViewSet):
+    """
+    ViewSet для массового импорта пользователей из CSV или JSONL
+    (только для администраторов).
+    """
+
+    permission_classes = [IsAdmin]
+
+    def create(self, request):
+        """
+        Импортировать пользователей из загруженного файла.
+
+        Ответ передается потоком в формате JSONL: строка с прогрессом
+        после каждого пакета, строка со статусом error для пакета,
+        который не удалось вставить, и итоговая строка со статусом done
+        (или failed, если импорт прерван). Пароли хешируются в общем
+        ограниченном пуле хеширования, а не в отдельных процессах.
+        """
+        serializer = UserImportSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        data = serializer.validated_data
+        importer = UserImporter(
+            chunk_size=data['chunk_size'],
+            hashing=password_hashing
+        )
+        records = read_records(
+            io.TextIOWrapper(data['file'].file, encoding='utf-8', newline=''),
+            data['format']
+        )
+        stats = ImportStats()
+
+        def line(state, **fields):
+            return json.dumps({'status': state, **fields}) + '\n'
+
+        def report():
+            try:
+                for error in importer.iter_run(records, stats):
+                    if error is not None:
+                        logger.error(
+                            f"Импорт пользователей: пакет со строки "
+                            f"{error['line']} не вставлен: {error['error']}"
+                        )
+                        yield line('error', **error)
+                    yield line('progress', **stats.as_dict())
+            except Exception as exc:
+                # Ответ уже начат со статусом 200: сообщаем об ошибке
+                # итоговой строкой, а не обрывом потока
+                logger.exception("Импорт пользователей прерван")
+                yield line('failed', error=str(exc), **stats.as_dict())
+                return
+            result = stats.as_dict()
+            logger.info(
+                f"Импорт пользователей: создано {result['created']}, "
+                f"пропущено {result['skipped']}, "
+                f"с ошибками {result['invalid'] + result['failed']}"
+            )
+            yield line('done', **result)
+
+        return StreamingHttpResponse(
+            report(),
+            content_type='application/x-ndjson'
+        )
@@ -0,0 +1,275 @@
+"""
+Двухуровневый кэш: L1 в памяти процесса перед общим Django-кэшем (L2).
+
+L1 отвечает без сетевых обращений, L2 разделяется всеми воркерами и
+узлами, поэтому прогретые данные и инвалидации видны везде. Каждое
+пространство имен хранит в L2 счетчик поколений: его увеличение
+разом делает недействительными все записи пространства.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+# Маркер отсутствующего в L2 ключа, запоминаемый в L1
+_MISSING = object()
+
+
+class TTLCache:
+    """Ограниченный по размеру LRU-кэш с временем жизни записей."""
+
+    def __init__(self, max_size=10000, ttl=60, timer=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._timer = timer
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Вернуть значение или None, если записи нет или она устарела."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, value = entry
+            if expires <= self._timer():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Сохранить значение, вытеснив самые старые записи."""
+        if self.max_size <= 0:
+            return
+        expires = self._timer() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        """Удалить запись по ключу."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        """Удалить все записи, значение которых удовлетворяет условию."""
+        with self._lock:
+            keys = [
+                key for key, (_, value) in self._data.items()
+                if predicate(value)
+            ]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def clear(self):
+        """Очистить кэш."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """Счетчики попаданий и промахов."""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+class TwoTierCache:
+    """
+    Кэш пространства имен `namespace` с уровнями L1 и L2.
+
+    Ключи L2 имеют вид `<namespace>:<key>` (плюс KEY_PREFIX и VERSION
+    бэкенда); `version` — версия формата значений пространства, ее
+    нужно увеличивать при изменении структуры кэшируемых данных.
+    Значения в L2 хранятся вместе с поколением пространства и
+    отбрасываются после `invalidate_all()`. Записи L1 живут `local_ttl`
+    секунд, это верхняя граница устаревания на остальных узлах.
+
+    При `cache_missing=True` L1 запоминает и отсутствие ключа в L2,
+    чтобы частые проверки несуществующих ключей не ходили в L2.
+    """
+
+    GENERATION_KEY = '__generation__'
+
+    def __init__(self, namespace, ttl, local_ttl, local_max_size,
+                 alias=None, version=1, enabled=True, cache_missing=False):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.alias = alias or getattr(settings, 'AUTH_CACHE_ALIAS', 'default')
+        self.version = version
+        self.enabled = enabled
+        self.cache_missing = cache_missing
+        self.local = TTLCache(max_size=local_max_size, ttl=local_ttl)
+        self.remote_hits = 0
+        self.remote_misses = 0
+
+    @property
+    def remote(self):
+        return caches[self.alias]
+
+    def make_key(self, key):
+        return f'{self.namespace}:{key}'
+
+    def get(self, key):
+        """Вернуть значение из L1 или L2, либо None."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """Вернуть словарь найденных значений за одно обращение к L2."""
+        values, _ = self._get_many(keys)
+        return values
+
+    def get_or_set(self, key, compute):
+        """Вернуть значение, при промахе вычислив его через compute()."""
+        return self.get_many_or_set([key], lambda missing: {
+            key: compute()
+        })[key]
+
+    def get_many_or_set(self, keys, compute_missing):
+        """
+        Вернуть значения для всех ключей.
+
+        Для ненайденных ключей вызывается compute_missing(missing),
+        которая должна вернуть словарь значений; результат сохраняется
+        с поколением, прочитанным до вычисления, так что конкурирующая
+        инвалидация не оставит в кэше устаревших данных.
+        """
+        values, generation = self._get_many(keys)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            computed = compute_missing(missing)
+            self._set_many(computed, generation)
+            values.update(computed)
+        return values
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, mapping):
+        """Сохранить значения в L1 и L2."""
+        if not self.enabled:
+            return
+        self._set_many(mapping, self.generation())
+
+    def delete(self, key):
+        self.delete_many([key])
+
+    def delete_many(self, keys):
+        """Удалить ключи из L1 и L2."""
+        for key in keys:
+            self.local.delete(key)
+        if self.enabled and keys:
+            self.remote.delete_many(
+                [self.make_key(key) for key in keys],
+                version=self.version
+            )
+
+    def delete_local_where(self, predicate):
+        """Удалить из L1 записи, значение которых удовлетворяет условию."""
+        return self.local.delete_where(predicate)
+
+    def invalidate_all(self):
+        """Сделать недействительными все записи пространства имен."""
+        self.local.clear()
+        if not self.enabled:
+            return
+        key = self.make_key(self.GENERATION_KEY)
+        try:
+            self.remote.incr(key, version=self.version)
+        except ValueError:
+            # Счетчика еще нет или он вытеснен из L2
+            self.remote.add(key, 1, timeout=None, version=self.version)
+
+    def stats(self):
+        remote_total = self.remote_hits + self.remote_misses
+        return {
+            'enabled': self.enabled,
+            'namespace': self.namespace,
+            'alias': self.alias,
+            'version': self.version,
+            'ttl': self.ttl,
+            'local': self.local.stats(),
+            'remote': {
+                'hits': self.remote_hits,
+                'misses': self.remote_misses,
+                'hit_rate': (
+                    self.remote_hits / remote_total if remote_total else 0.0
+                ),
+            },
+        }
+
+    def generation(self):
+        """Текущее поколение пространства имен."""
+        if not self.enabled:
+            return 0
+        key = self.make_key(self.GENERATION_KEY)
+        return self.remote.get(key, 0, version=self.version)
+
+    def _get_many(self, keys):
+        if not self.enabled:
+            return {}, 0
+        values = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(key)
+            if value is None:
+                missing.append(key)
+            elif value is not _MISSING:
+                values[key] = value
+        if not missing:
+            return values, None
+
+        generation_key = self.make_key(self.GENERATION_KEY)
+        remote_keys = {self.make_key(key): key for key in missing}
+        found = self.remote.get_many(
+            [generation_key, *remote_keys],
+            version=self.version
+        )
+        generation = found.pop(generation_key, 0)
+        for remote_key, key in remote_keys.items():
+            entry = found.get(remote_key)
+            if entry is not None and entry[0] == generation:
+                values[key] = entry[1]
+                self.local.set(key, entry[1])
+                self.remote_hits += 1
+            else:
+                self.remote_misses += 1
+                if self.cache_missing:
+                    self.local.set(key, _MISSING)
+        return values, generation
+
+    def _set_many(self, mapping, generation):
+        if not self.enabled or not mapping:
+            return
+        if generation is None:
+            generation = self.generation()
+        for key, value in mapping.items():
+            self.local.set(key, value)
+        self.remote.set_many(
+            {
+                self.make_key(key): (generation, value)
+                for key, value in mapping.items()
+            },
+            timeout=self.ttl,
+            version=self.version
+        )
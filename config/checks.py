@@ -0,0 +1,40 @@
+"""
+Системные проверки конфигурации.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+# Бэкенды, данные которых видны только текущему процессу
+PER_PROCESS_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Кэш аутентификации и прав должен быть общим для всех воркеров:
+    через него расходятся отзывы токенов и инвалидации RBAC. С кэшем
+    в памяти процесса остальные воркеры продолжают выдавать отозванные
+    права до истечения TTL, поэтому без DEBUG такая конфигурация
+    считается ошибкой.
+    """
+    if settings.DEBUG:
+        return []
+    alias = getattr(settings, 'AUTH_CACHE_ALIAS', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in PER_PROCESS_CACHE_BACKENDS:
+        return []
+    return [
+        Error(
+            f"Кэш '{alias}' ({backend}) не разделяется между процессами.",
+            hint=(
+                'Укажите в CACHE_BACKEND общий бэкенд: '
+                'django.core.cache.backends.db.DatabaseCache или '
+                'django.core.cache.backends.redis.RedisCache.'
+            ),
+            id='config.E001',
+        )
+    ]
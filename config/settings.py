@@ -59,6 +59,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.authorization.middleware.RBACVersionMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -97,6 +98,44 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# The cache must be shared by all workers and nodes: it carries token
+# revocations and RBAC invalidations. The default database cache needs
+# `manage.py createcachetable`; Redis
+# (django.core.cache.backends.redis.RedisCache) is faster. Per-process
+# backends (LocMemCache) fail the system check unless DEBUG is on.
+# Redis is recommended in production; its memory limit must fit the
+# working set (maxmemory-policy volatile-lru or noeviction).
+
+CACHES = {
+    'default': {
+        'BACKEND': config(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.db.DatabaseCache'
+        ),
+        'LOCATION': config('CACHE_LOCATION', default='auth_cache'),
+        'KEY_PREFIX': config('CACHE_KEY_PREFIX', default='auth_system'),
+        'TIMEOUT': 300,
+    }
+}
+if CACHES['default']['BACKEND'].endswith('.DatabaseCache'):
+    # The database cache culls a third of its rows once it holds
+    # MAX_ENTRIES (300 by default); size it for every live token snapshot,
+    # revocation mark and permission entry
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': config(
+            'CACHE_MAX_ENTRIES',
+            default=1000000,
+            cast=int
+        ),
+        'CULL_FREQUENCY': 10,
+    }
+
+# Alias of the shared (L2) cache used by auth and authorization
+AUTH_CACHE_ALIAS = 'default'
+
+
 # Custom User Model
 AUTH_USER_MODEL = 'users.CustomUser'
 
@@ -184,3 +223,221 @@ TOKEN_EXPIRATION_HOURS = config(
     default=24,
     cast=int
 )
+
+# Accept tokens of the old plain-text format (migration window)
+TOKEN_LEGACY_LOOKUP = config('TOKEN_LEGACY_LOOKUP', default=True, cast=bool)
+
+# Lifetime of signed access tokens (in minutes)
+ACCESS_TOKEN_LIFETIME_MINUTES = config(
+    'ACCESS_TOKEN_LIFETIME_MINUTES',
+    default=15,
+    cast=int
+)
+
+# Interval in seconds of `manage.py cleanup_tokens --loop`, the periodic
+# cleanup of expired and inactive tokens
+TOKEN_SWEEP_INTERVAL = config('TOKEN_SWEEP_INTERVAL', default=300, cast=int)
+TOKEN_SWEEP_BATCH_SIZE = config(
+    'TOKEN_SWEEP_BATCH_SIZE',
+    default=5000,
+    cast=int
+)
+# Pause between batches (in seconds)
+TOKEN_SWEEP_PAUSE = config('TOKEN_SWEEP_PAUSE', default=0.1, cast=float)
+
+# Range-partition the tokens table by expires_at, one partition per day
+# (PostgreSQL only). Convert with `manage.py token_partitions --convert`.
+TOKEN_PARTITIONING = config('TOKEN_PARTITIONING', default=False, cast=bool)
+TOKEN_PARTITION_DAYS_AHEAD = config(
+    'TOKEN_PARTITION_DAYS_AHEAD',
+    default=7,
+    cast=int
+)
+TOKEN_PARTITION_GRACE_DAYS = config(
+    'TOKEN_PARTITION_GRACE_DAYS',
+    default=1,
+    cast=int
+)
+
+# Login of a client that already holds an active token (same device_id
+# sent in the login request and User-Agent) reissues that token instead
+# of creating a new one; logins without device_id always get a new token
+TOKEN_REUSE_FOR_SAME_CLIENT = config(
+    'TOKEN_REUSE_FOR_SAME_CLIENT',
+    default=True,
+    cast=bool
+)
+# Maximum number of active tokens per user; the oldest ones are
+# invalidated on login. 0 disables the limit.
+TOKEN_MAX_ACTIVE_PER_USER = config(
+    'TOKEN_MAX_ACTIVE_PER_USER',
+    default=10,
+    cast=int
+)
+
+# Write-behind tracking of token usage: last_used_at and sliding expiry
+# are buffered in memory and written as one bulk UPDATE per interval
+TOKEN_ACTIVITY_TRACKING = config(
+    'TOKEN_ACTIVITY_TRACKING',
+    default=True,
+    cast=bool
+)
+# Flush interval of the buffer (in seconds)
+TOKEN_ACTIVITY_FLUSH_INTERVAL = config(
+    'TOKEN_ACTIVITY_FLUSH_INTERVAL',
+    default=10,
+    cast=int
+)
+# Precision of last_used_at (in seconds): a token is recorded again only
+# after this much time has passed since its previous record
+TOKEN_ACTIVITY_STALENESS = config(
+    'TOKEN_ACTIVITY_STALENESS',
+    default=300,
+    cast=int
+)
+# Flush early once this many tokens are pending
+TOKEN_ACTIVITY_MAX_PENDING = config(
+    'TOKEN_ACTIVITY_MAX_PENDING',
+    default=10000,
+    cast=int
+)
+# Extend a token to TOKEN_EXPIRATION_HOURS from now when less than
+# TOKEN_SLIDING_THRESHOLD_HOURS of its lifetime remain
+TOKEN_SLIDING_EXPIRATION = config(
+    'TOKEN_SLIDING_EXPIRATION',
+    default=True,
+    cast=bool
+)
+TOKEN_SLIDING_THRESHOLD_HOURS = config(
+    'TOKEN_SLIDING_THRESHOLD_HOURS',
+    default=6,
+    cast=int
+)
+
+# Password hashers. Existing hashes of any listed hasher stay valid and
+# are rehashed with the first one on the next successful login.
+PASSWORD_HASHERS = [
+    'apps.users.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+# PBKDF2 iteration count; tune with `manage.py calibrate_hashers`
+PASSWORD_PBKDF2_ITERATIONS = config(
+    'PASSWORD_PBKDF2_ITERATIONS',
+    default=600000,
+    cast=int
+)
+
+# Password hashing pool: 'auto' picks threads for GIL-releasing hashers
+# (PBKDF2, bcrypt, Argon2, scrypt) and processes otherwise; 'thread',
+# 'process' or 'inline' (no pool) force the choice
+PASSWORD_HASHING_EXECUTOR = config(
+    'PASSWORD_HASHING_EXECUTOR',
+    default='auto'
+)
+# Number of hashing workers; 0 means one per CPU core
+PASSWORD_HASHING_WORKERS = config(
+    'PASSWORD_HASHING_WORKERS',
+    default=0,
+    cast=int
+)
+# Hashes waiting for a worker; further logins get 503 right away
+PASSWORD_HASHING_QUEUE_SIZE = config(
+    'PASSWORD_HASHING_QUEUE_SIZE',
+    default=32,
+    cast=int
+)
+# Maximum wait for a hash result (in seconds)
+PASSWORD_HASHING_TIMEOUT = config(
+    'PASSWORD_HASHING_TIMEOUT',
+    default=5,
+    cast=float
+)
+
+# Bulk user import (manage.py import_users, /api/admin/user-imports/):
+# users inserted per bulk_create and processes hashing plain-text
+# passwords (0 means one per CPU core)
+USER_IMPORT_CHUNK_SIZE = config(
+    'USER_IMPORT_CHUNK_SIZE',
+    default=1000,
+    cast=int
+)
+USER_IMPORT_WORKERS = config('USER_IMPORT_WORKERS', default=0, cast=int)
+
+# Two-tier token cache for CustomTokenAuthentication
+TOKEN_CACHE_ENABLED = config('TOKEN_CACHE_ENABLED', default=True, cast=bool)
+# Lifetime of a token snapshot in the shared cache (in seconds)
+TOKEN_CACHE_TTL = config('TOKEN_CACHE_TTL', default=60, cast=int)
+# Lifetime of an in-process copy; bounds staleness on other nodes
+TOKEN_CACHE_LOCAL_TTL = config('TOKEN_CACHE_LOCAL_TTL', default=5, cast=int)
+TOKEN_CACHE_MAX_SIZE = config('TOKEN_CACHE_MAX_SIZE', default=10000, cast=int)
+
+# Bloom filter of issued tokens: rejects unknown tokens without a DB
+# query. Tokens issued by other workers are picked up by an incremental
+# sync on a miss; the shared cache only speeds this up.
+TOKEN_FILTER_ENABLED = config(
+    'TOKEN_FILTER_ENABLED',
+    default=False,
+    cast=bool
+)
+TOKEN_FILTER_CAPACITY = config(
+    'TOKEN_FILTER_CAPACITY',
+    default=1000000,
+    cast=int
+)
+TOKEN_FILTER_ERROR_RATE = config(
+    'TOKEN_FILTER_ERROR_RATE',
+    default=0.001,
+    cast=float
+)
+# Rebuild interval of the filter (in seconds)
+TOKEN_FILTER_REBUILD_INTERVAL = config(
+    'TOKEN_FILTER_REBUILD_INTERVAL',
+    default=3600,
+    cast=int
+)
+# Minimum pause between incremental syncs triggered by misses (in seconds)
+TOKEN_FILTER_SYNC_INTERVAL = config(
+    'TOKEN_FILTER_SYNC_INTERVAL',
+    default=1.0,
+    cast=float
+)
+
+# Maximum number of checks in one /api/admin/decisions/ request
+AUTHZ_BATCH_MAX_CHECKS = config(
+    'AUTHZ_BATCH_MAX_CHECKS',
+    default=5000,
+    cast=int
+)
+
+# Maximum number of user ids or emails in one bulk role assignment request
+AUTHZ_BULK_ASSIGN_MAX_USERS = config(
+    'AUTHZ_BULK_ASSIGN_MAX_USERS',
+    default=10000,
+    cast=int
+)
+
+# Source of check_resource_permission: 'engine' (compiled bitmasks in the
+# permission cache) or 'table' (index lookup in user_effective_permissions,
+# for deployments with a cold or disabled cache)
+PERMISSION_CHECK_SOURCE = config('PERMISSION_CHECK_SOURCE', default='engine')
+
+# Two-tier cache of permission decisions
+PERMISSION_CACHE_ENABLED = config(
+    'PERMISSION_CACHE_ENABLED',
+    default=True,
+    cast=bool
+)
+PERMISSION_CACHE_TTL = config('PERMISSION_CACHE_TTL', default=300, cast=int)
+PERMISSION_CACHE_LOCAL_TTL = config(
+    'PERMISSION_CACHE_LOCAL_TTL',
+    default=5,
+    cast=int
+)
+PERMISSION_CACHE_MAX_SIZE = config(
+    'PERMISSION_CACHE_MAX_SIZE',
+    default=10000,
+    cast=int
+)
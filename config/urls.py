@@ -14,6 +14,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('apps.users.urls')),
     path('api/admin/', include('apps.authorization.urls')),
+    path('api/admin/', include('apps.users.admin_urls')),
     path('api/', include('apps.mock_business.urls')),
     # Frontend routes
     path('', index_view, name='index'),
@@ -3,6 +3,9 @@
 Скрипт для проверки работы всего приложения:
 - База данных
 - API endpoints
+- Сессии: access-токены, обновление, выход и лимит сессий
+- RBAC: массовое назначение ролей, наследование, шаблоны и запреты
+- Импорт пользователей
 - Админка
 - Фронтенд
 
@@ -18,6 +21,7 @@
 скрипт использует существующий экземпляр и не останавливает его.
 """
 
+import json
 import os
 import sys
 import django
@@ -55,6 +59,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 django.setup()
 
+from django.conf import settings  # noqa: E402
 from django.contrib.auth import get_user_model  # noqa: E402
 from django.db import connection  # noqa: E402
 from apps.authorization.models import (  # noqa: E402
@@ -401,6 +406,377 @@ def check_api():
         return False
 
 
+def expect_status(response, expected, description):
+    """Сравнить статус ответа с ожидаемым и напечатать результат."""
+    if response.status_code in expected:
+        print_success(f"{description} - {response.status_code}")
+        return True
+    print_error(
+        f"{description} вернул {response.status_code}: "
+        f"{response.text[:100]}"
+    )
+    return False
+
+
+def register_user(prefix):
+    """Зарегистрировать нового пользователя и вернуть (email, пароль)."""
+    email = f"{prefix}_{datetime.now().timestamp()}@test.com"
+    password = "Test123456!"
+    response = requests.post(
+        f"{BASE_URL}/api/auth/register/",
+        json={
+            "email": email,
+            "password": password,
+            "password_confirm": password,
+            "first_name": "Test",
+            "last_name": "User"
+        },
+        timeout=5
+    )
+    if response.status_code != 201:
+        raise RuntimeError(
+            f"Регистрация {email} вернула {response.status_code}: "
+            f"{response.text[:100]}"
+        )
+    return email, password
+
+
+def login(email, password, device_id=None):
+    """Войти и вернуть ответ /api/auth/login/ в виде словаря."""
+    data = {"email": email, "password": password}
+    if device_id:
+        data["device_id"] = device_id
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login/",
+        json=data,
+        timeout=5
+    )
+    if response.status_code != 200:
+        raise RuntimeError(
+            f"Вход {email} вернул {response.status_code}: "
+            f"{response.text[:100]}"
+        )
+    return response.json()
+
+
+def token_headers(token):
+    return {"Authorization": f"Token {token}"}
+
+
+def bearer_headers(access_token):
+    return {"Authorization": f"Bearer {access_token}"}
+
+
+def check_sessions():
+    """Проверка access-токенов, обновления, выхода и лимита сессий."""
+    print_header("ПРОВЕРКА СЕССИЙ И ACCESS-ТОКЕНОВ")
+
+    try:
+        ok = True
+        email, password = register_user("session")
+        data = login(email, password, device_id="test-device")
+        token = data['token']
+
+        # login -> refresh -> Bearer
+        response = requests.post(
+            f"{BASE_URL}/api/auth/refresh/",
+            headers=token_headers(token),
+            timeout=5
+        )
+        ok &= expect_status(response, [200], "POST /api/auth/refresh/")
+        access_token = response.json().get('access_token', '')
+        ok &= expect_status(
+            requests.get(
+                f"{BASE_URL}/api/auth/profile/me/",
+                headers=bearer_headers(access_token),
+                timeout=5
+            ),
+            [200],
+            "GET /api/auth/profile/me/ с Bearer"
+        )
+        ok &= expect_status(
+            requests.get(
+                f"{BASE_URL}/api/auth/profile/me/",
+                headers=bearer_headers(access_token[:-2] + "xx"),
+                timeout=5
+            ),
+            [401, 403],
+            "GET /api/auth/profile/me/ с поддельным Bearer"
+        )
+
+        # Повторный вход с тем же device_id переиспользует сессию:
+        # строка токена меняется, прежняя перестает действовать
+        previous_token = token
+        token = login(email, password, device_id="test-device")['token']
+        ok &= expect_status(
+            requests.get(
+                f"{BASE_URL}/api/auth/profile/me/",
+                headers=token_headers(previous_token),
+                timeout=5
+            ),
+            [401, 403],
+            "Прежний токен устройства отклонен"
+        )
+        response = requests.get(
+            f"{BASE_URL}/api/auth/sessions/",
+            headers=token_headers(login(email, password)['token']),
+            timeout=5
+        )
+        ok &= expect_status(response, [200], "GET /api/auth/sessions/")
+        if len(response.json()) != 2:
+            print_error(
+                f"Ожидалось 2 сессии, получено {len(response.json())}"
+            )
+            ok = False
+
+        # logout отзывает refresh-токен и выпущенные из него access-токены
+        ok &= expect_status(
+            requests.post(
+                f"{BASE_URL}/api/auth/logout/",
+                headers=token_headers(token),
+                timeout=5
+            ),
+            [200],
+            "POST /api/auth/logout/"
+        )
+        ok &= expect_status(
+            requests.get(
+                f"{BASE_URL}/api/auth/profile/me/",
+                headers=bearer_headers(access_token),
+                timeout=5
+            ),
+            [401, 403],
+            "Bearer после выхода отклонен"
+        )
+        ok &= expect_status(
+            requests.post(
+                f"{BASE_URL}/api/auth/refresh/",
+                headers=token_headers(token),
+                timeout=5
+            ),
+            [401, 403],
+            "POST /api/auth/refresh/ после выхода отклонен"
+        )
+
+        # Лимит активных сессий: самые старые токены инвалидируются
+        limit = settings.TOKEN_MAX_ACTIVE_PER_USER
+        if limit:
+            email, password = register_user("cap")
+            tokens = [
+                login(email, password)['token'] for _ in range(limit + 1)
+            ]
+            response = requests.get(
+                f"{BASE_URL}/api/auth/sessions/",
+                headers=token_headers(tokens[-1]),
+                timeout=5
+            )
+            if len(response.json()) == limit:
+                print_success(f"Лимит сессий соблюден ({limit})")
+            else:
+                print_error(
+                    f"Активных сессий {len(response.json())} "
+                    f"при лимите {limit}"
+                )
+                ok = False
+            ok &= expect_status(
+                requests.get(
+                    f"{BASE_URL}/api/auth/profile/me/",
+                    headers=token_headers(tokens[0]),
+                    timeout=5
+                ),
+                [401, 403],
+                "Самый старый токен сверх лимита отклонен"
+            )
+
+        return bool(ok)
+
+    except Exception as e:
+        print_error(f"Ошибка при проверке сессий: {e}")
+        return False
+
+
+def check_rbac():
+    """
+    Проверка массового назначения ролей и решений RBAC: наследование
+    ролей, шаблоны '*' и приоритет запрета над разрешением.
+    """
+    print_header("ПРОВЕРКА RBAC")
+
+    roles = []
+    headers = {}
+    try:
+        ok = True
+        headers = token_headers(
+            login("admin@example.com", "admin123")['token']
+        )
+        email, _ = register_user("rbac")
+        user_id = User.objects.get(email=email).pk
+        suffix = int(datetime.now().timestamp() * 1000)
+
+        # Родительская роль разрешает reports.* шаблоном, дочерняя
+        # наследует ее и запрещает reports.delete
+        response = requests.post(
+            f"{BASE_URL}/api/admin/roles/",
+            json={"name": f"itest-parent-{suffix}"},
+            headers=headers,
+            timeout=5
+        )
+        ok &= expect_status(response, [201], "POST /api/admin/roles/")
+        parent_id = response.json()['id']
+        roles.append(parent_id)
+        response = requests.post(
+            f"{BASE_URL}/api/admin/roles/",
+            json={"name": f"itest-child-{suffix}", "parent_ids": [parent_id]},
+            headers=headers,
+            timeout=5
+        )
+        ok &= expect_status(
+            response, [201], "POST /api/admin/roles/ с parent_ids"
+        )
+        child_id = response.json()['id']
+        roles.append(child_id)
+        grants = [
+            (parent_id, "reports", "*", "allow"),
+            (child_id, "reports", "delete", "deny"),
+        ]
+        for role_id, resource, action_name, effect in grants:
+            ok &= expect_status(
+                requests.post(
+                    f"{BASE_URL}/api/admin/roles/{role_id}/permissions/",
+                    json={
+                        "resource_name": resource,
+                        "action_name": action_name,
+                        "effect": effect
+                    },
+                    headers=headers,
+                    timeout=5
+                ),
+                [201],
+                f"{effect} {resource}.{action_name}"
+            )
+
+        # Массовое назначение
+        response = requests.post(
+            f"{BASE_URL}/api/admin/user-roles/bulk-assign/",
+            json={"user_ids": [user_id], "role_ids": [child_id]},
+            headers=headers,
+            timeout=5
+        )
+        ok &= expect_status(
+            response, [200], "POST /api/admin/user-roles/bulk-assign/"
+        )
+        if response.json().get('created') != 1:
+            print_error(f"bulk-assign: {response.json()}")
+            ok = False
+
+        expected = {
+            ("reports", "read"): True,      # шаблон родительской роли
+            ("reports", "archive"): True,   # имя вне каталога по шаблону
+            ("reports", "delete"): False,   # запрет сильнее разрешения
+            ("products", "delete"): False,
+        }
+        ok &= check_decisions(headers, user_id, expected)
+
+        response = requests.post(
+            f"{BASE_URL}/api/admin/user-roles/bulk-revoke/",
+            json={"user_ids": [user_id], "role_ids": [child_id]},
+            headers=headers,
+            timeout=5
+        )
+        ok &= expect_status(
+            response, [200], "POST /api/admin/user-roles/bulk-revoke/"
+        )
+        if response.json().get('revoked') != 1:
+            print_error(f"bulk-revoke: {response.json()}")
+            ok = False
+        ok &= check_decisions(
+            headers, user_id, {key: False for key in expected}
+        )
+
+        return bool(ok)
+
+    except Exception as e:
+        print_error(f"Ошибка при проверке RBAC: {e}")
+        return False
+
+    finally:
+        for role_id in reversed(roles):
+            requests.delete(
+                f"{BASE_URL}/api/admin/roles/{role_id}/",
+                headers=headers,
+                timeout=5
+            )
+
+
+def check_decisions(headers, user_id, expected):
+    """Сверить решения /api/admin/decisions/ с ожидаемыми."""
+    response = requests.post(
+        f"{BASE_URL}/api/admin/decisions/",
+        json={"checks": [
+            {"user_id": user_id, "resource": resource, "action": action_name}
+            for resource, action_name in expected
+        ]},
+        headers=headers,
+        timeout=5
+    )
+    if not expect_status(response, [200], "POST /api/admin/decisions/"):
+        return False
+    ok = True
+    for decision in response.json()['decisions']:
+        key = (decision['resource'], decision['action'])
+        if decision['allowed'] != expected[key]:
+            print_error(
+                f"Решение {key[0]}.{key[1]}: {decision['allowed']}, "
+                f"ожидалось {expected[key]}"
+            )
+            ok = False
+    if ok:
+        print_success(f"Решения RBAC совпали ({len(expected)} проверок)")
+    return ok
+
+
+def check_user_import():
+    """Проверка потокового импорта пользователей из JSONL."""
+    print_header("ПРОВЕРКА ИМПОРТА ПОЛЬЗОВАТЕЛЕЙ")
+
+    try:
+        headers = token_headers(
+            login("admin@example.com", "admin123")['token']
+        )
+        email = f"import_{datetime.now().timestamp()}@test.com"
+        content = json.dumps({
+            "email": email,
+            "password": "Test123456!",
+            "first_name": "Import",
+            "last_name": "User"
+        }) + "\n"
+        response = requests.post(
+            f"{BASE_URL}/api/admin/user-imports/",
+            files={"file": ("users.jsonl", content, "application/x-ndjson")},
+            data={"chunk_size": 100},
+            headers=headers,
+            timeout=30
+        )
+        if not expect_status(
+            response, [200], "POST /api/admin/user-imports/"
+        ):
+            return False
+        lines = [
+            json.loads(line) for line in response.text.splitlines() if line
+        ]
+        result = lines[-1] if lines else {}
+        if result.get('status') != 'done' or result.get('created') != 1:
+            print_error(f"Итог импорта: {result}")
+            return False
+        login(email, "Test123456!")
+        print_success("Импортированный пользователь может войти")
+        return True
+
+    except Exception as e:
+        print_error(f"Ошибка при проверке импорта: {e}")
+        return False
+
+
 def check_admin():
     """Проверка админки."""
     print_header("ПРОВЕРКА АДМИНКИ")
@@ -493,6 +869,9 @@ def main():
         results = {
             "База данных": check_database(),
             "API": check_api(),
+            "Сессии": check_sessions(),
+            "RBAC": check_rbac(),
+            "Импорт пользователей": check_user_import(),
             "Админка": check_admin(),
             "Фронтенд": check_frontend(),
         }
@@ -523,12 +902,12 @@ def main():
         logger.info("\nРекомендации:")
         if not results.get("База данных", False):
             logger.info("- Запустите: python manage.py init_test_data")
-        api_or_admin_or_frontend = (
-            not results.get("API", False)
-            or not results.get("Админка", False)
-            or not results.get("Фронтенд", False)
+        server_checks_failed = any(
+            not passed
+            for component, passed in results.items()
+            if component != "База данных"
         )
-        if api_or_admin_or_frontend:
+        if server_checks_failed:
             logger.info(
                 "- Проверьте логи сервера выше для диагностики проблем"
             )